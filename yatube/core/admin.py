@@ -0,0 +1,31 @@
+from django.contrib import admin
+
+from .models import Task
+from .tasks import queue_depth
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'run_at',
+        'attempts',
+        'created',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('claim', 'locked_until', 'last_error')
+    empty_value_display = '-пусто-'
+
+    def changelist_view(self, request, extra_context=None):
+        depth = queue_depth()
+        extra_context = extra_context or {}
+        extra_context['title'] = (
+            f'Задачи: в очереди {depth[Task.PENDING]}, '
+            f'выполняется {depth[Task.RUNNING]}, '
+            f'с ошибкой {depth[Task.FAILED]}')
+        return super().changelist_view(request, extra_context)
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,37 @@
+"""Отложенные действия, которые выполняются после отправки ответа."""
+import logging
+import threading
+
+from django.core.signals import request_finished, request_started
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def run_after_response(func, *args, **kwargs):
+    """Выполняет ``func`` после ответа или сразу, если запроса нет."""
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        func(*args, **kwargs)
+        return
+    if (func, args, kwargs) not in pending:
+        pending.append((func, args, kwargs))
+
+
+def _start(**kwargs):
+    _local.pending = []
+
+
+def _finish(**kwargs):
+    pending = getattr(_local, 'pending', None) or []
+    _local.pending = None
+    for func, args, kwargs in pending:
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('Отложенное действие %r не выполнено', func)
+
+
+request_started.connect(_start)
+request_finished.connect(_finish)
@@ -0,0 +1,455 @@
+"""Кэш, общий для всех процессов, с локальным LRU-уровнем в каждом процессе.
+
+``SQLiteCache`` хранит записи в отдельном файле SQLite (WAL), поэтому его
+видят все WSGI-процессы без внешнего сервиса. ``TieredCache`` ставит перед
+ним небольшой LRU в памяти процесса. Каждая запись, ``incr`` и удаление
+добавляют изменённые ключи в общий журнал изменений; сверяясь с журналом,
+процесс выбрасывает из локального уровня только эти ключи. Очистка
+увеличивает общий счётчик поколений и сбрасывает локальный уровень целиком.
+"""
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+GENERATION_KEY = 'tiered:generation'
+CHANGES_KEY = 'tiered:changes'
+
+# Сколько секунд хранится запись журнала изменений и сколько записей
+# процесс готов прочитать за раз; иначе он сбрасывает локальный уровень.
+CHANGE_TIMEOUT = 60
+MAX_CHANGES = 1000
+
+_MISSING = object()
+
+# Локальные уровни общие для всех потоков процесса, как у LocMemCache.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+def _raw_key(key, key_prefix, version):
+    return key
+
+
+def _change_key(number):
+    return f'tiered:change:{number}'
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в отдельном файле SQLite, общий для всех процессов."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    cull_probability = 0.01
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def _encode(self, value):
+        # Целые числа храним как есть, чтобы incr выполнялся в самой SQLite.
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()))
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._encode(value), self.get_backend_timeout(timeout)))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        made = list(keys)
+        for start in range(0, len(made), 500):
+            chunk = made[start:start + 500]
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)), chunk)
+            for key, value, expires in rows:
+                if self._alive(expires):
+                    found[keys[key]] = self._decode(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._encode(value), expires)
+            for key, value in data.items()
+        ]
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows)
+            if random.random() < self.cull_probability:
+                self._cull(db)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.execute(
+                'UPDATE cache SET value = value + ? '
+                'WHERE key = ? AND typeof(value) = \'integer\' '
+                'AND (expires IS NULL OR expires > ?)',
+                (delta, key, time.time()))
+            if cursor.rowcount != 1:
+                raise ValueError("Key '%s' not found" % key)
+            value = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        cursor = self._db.executemany('DELETE FROM cache WHERE key = ?', keys)
+        return cursor.rowcount
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self, db):
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            db.execute('DELETE FROM cache')
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,))
+
+
+class _LocalTier:
+    """Ограниченный LRU процесса, последнее увиденное поколение
+    и номер последнего учтённого изменения.
+    """
+
+    def __init__(self, max_entries):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.generation = None
+        self.changes = None
+        self.gap = None
+        # Изменения самого процесса: его локальный уровень уже свежий.
+        self.own = set()
+        self.checked_at = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, pickled, timeout):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self, generation, changes):
+        with self.lock:
+            self.entries.clear()
+            self.generation = generation
+            self.changes = changes
+            self.gap = None
+            self.own.clear()
+
+
+class TieredCache(BaseCache):
+    """LRU в памяти процесса перед общим для процессов хранилищем.
+
+    Параметры ``OPTIONS``: ``SHARED_BACKEND`` (по умолчанию ``SQLiteCache``),
+    ``L1_MAX_ENTRIES``, ``L1_TIMEOUT`` — сколько секунд запись живёт в
+    памяти процесса, и ``GENERATION_CHECK_INTERVAL`` — как часто процесс
+    сверяет журнал изменений и счётчик поколений. Новое значение ключа
+    после ``set``, ``incr`` или ``delete`` другие процессы видят не позже
+    чем через ``GENERATION_CHECK_INTERVAL`` секунд; остальные записи их
+    локального уровня при этом не сбрасываются.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        backend = import_string(options.get(
+            'SHARED_BACKEND', 'core.cache.SQLiteCache'))
+        self._shared = backend(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_FUNCTION': _raw_key,
+            'OPTIONS': {
+                name: value for name, value in options.items()
+                if name in ('MAX_ENTRIES', 'CULL_FREQUENCY')
+            },
+        })
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._check_interval = options.get('GENERATION_CHECK_INTERVAL', 1)
+        with _local_tiers_lock:
+            self._l1 = _local_tiers.setdefault(
+                location, _LocalTier(options.get('L1_MAX_ENTRIES', 500)))
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _sync_generation(self):
+        now = time.monotonic()
+        tier = self._l1
+        if now < tier.checked_at + self._check_interval:
+            return
+        idle = now - tier.checked_at > self._l1_timeout + self._check_interval
+        tier.checked_at = now
+        state = self._shared.get_many([GENERATION_KEY, CHANGES_KEY])
+        generation = state.get(GENERATION_KEY)
+        changes = state.get(CHANGES_KEY, 0)
+        if (
+                idle or generation != tier.generation
+                or tier.changes is None or changes < tier.changes
+                or changes - tier.changes > MAX_CHANGES
+        ):
+            # Записи простаивавшего процесса уже истекли сами, а длинный
+            # журнал дешевле не читать.
+            tier.clear(generation, changes)
+            return
+        numbers = range(tier.changes + 1, changes + 1)
+        found = self._shared.get_many(
+            [_change_key(number) for number in numbers])
+        keys = []
+        for number in numbers:
+            key = found.get(_change_key(number))
+            if key is None:
+                if number == tier.gap:
+                    # Запись журнала так и не появилась или уже истекла.
+                    tier.clear(generation, changes)
+                    return
+                # Номер уже выдан, но запись ещё не сохранена.
+                tier.gap = number
+                break
+            if number in tier.own:
+                tier.own.discard(number)
+            else:
+                keys.append(key)
+            tier.changes = number
+        tier.discard(keys)
+
+    def _changes(self, keys):
+        """Номера в журнале изменений для ``keys``."""
+        if not self._shared.add(CHANGES_KEY, len(keys), timeout=None):
+            try:
+                last = self._shared.incr(CHANGES_KEY, len(keys))
+            except ValueError:
+                return self._changes(keys)
+        else:
+            last = len(keys)
+        return dict(enumerate(keys, last - len(keys) + 1))
+
+    def _log_changes(self, keys):
+        changes = self._changes(keys)
+        self._shared.set_many({
+            _change_key(number): key for number, key in changes.items()
+        }, CHANGE_TIMEOUT)
+        self._l1.own.update(changes)
+
+    def _bump_generation(self):
+        if not self._shared.add(GENERATION_KEY, 1, timeout=None):
+            try:
+                self._shared.incr(GENERATION_KEY)
+            except ValueError:
+                self._shared.add(GENERATION_KEY, 1, timeout=None)
+        state = self._shared.get_many([GENERATION_KEY, CHANGES_KEY])
+        self._l1.clear(
+            state.get(GENERATION_KEY), state.get(CHANGES_KEY, 0))
+        self._l1.checked_at = time.monotonic()
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT):
+        backend_timeout = self.get_backend_timeout(timeout)
+        l1_timeout = self._l1_timeout
+        if backend_timeout is not None:
+            l1_timeout = min(l1_timeout, backend_timeout - time.time())
+        if l1_timeout > 0:
+            self._l1.set(
+                key, pickle.dumps(value, self.pickle_protocol), l1_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        added = self._shared.add(key, value, timeout)
+        if added:
+            self._remember(key, value, timeout)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        self._sync_generation()
+        value = self._l1.get(key)
+        if value is not _MISSING:
+            return value
+        value = self._shared.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._remember(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        self._sync_generation()
+        found = {}
+        missing = []
+        for made, key in keys.items():
+            value = self._l1.get(made)
+            if value is _MISSING:
+                missing.append(made)
+            else:
+                found[key] = value
+        for made, value in self._shared.get_many(missing).items():
+            self._remember(made, value)
+            found[keys[made]] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {self._key(key, version): value for key, value in data.items()}
+        self._shared.set_many(data, timeout)
+        self._log_changes(list(data))
+        for key, value in data.items():
+            self._remember(key, value, timeout)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._l1.discard([key])
+        return self._shared.touch(key, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        self._l1.discard([key])
+        value = self._shared.incr(key, delta)
+        self._log_changes([key])
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        self._l1.discard(keys)
+        # SQLiteCache сообщает, сколько записей удалено; отсутствующие
+        # ключи не из чего выбрасывать в других процессах.
+        if self._shared.delete_many(keys) != 0:
+            self._log_changes(keys)
+
+    def clear(self):
+        generation = self._shared.get(GENERATION_KEY) or 0
+        self._shared.clear()
+        self._shared.add(GENERATION_KEY, generation, timeout=None)
+        self._bump_generation()
@@ -0,0 +1,55 @@
+"""Сжатие gzip и brotli для статики и ответов."""
+import gzip
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-Encoding в порядке предпочтения.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Расширения сжатых копий статики.
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+_PROTECTED = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)',
+    re.IGNORECASE | re.DOTALL)
+_INDENT = re.compile(r'\n\s+')
+
+
+def compress(content, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(content, quality=min(level, 11))
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток частями, не дожидаясь его конца."""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def minify_html(html):
+    """Убирает отступы и пустые строки вне pre, textarea, script и style."""
+    parts = _PROTECTED.split(html)
+    # split возвращает текст, защищённый блок и имя его тега по очереди.
+    for index in range(0, len(parts), 3):
+        parts[index] = _INDENT.sub('\n', parts[index])
+    del parts[2::3]
+    return ''.join(parts)
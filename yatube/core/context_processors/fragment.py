@@ -0,0 +1,5 @@
+def fragment(request):
+    """Добавляет признак запроса страницы без обёртки сайта."""
+    return {
+        'fragment': getattr(request, 'fragment', False)
+    }
@@ -0,0 +1,111 @@
+"""Проверки живости и готовности для балансировщика."""
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+WARMED_KEY = 'health:warmed_at'
+
+# Отметка о прогреве в общем кэше переживает перезапуск процессов,
+# поэтому процесс считает прогревом только то, что было после его старта.
+STARTED_AT = time.time()
+
+_lock = threading.Lock()
+_result = None
+_checked_at = 0
+_migrations_applied = False
+
+
+def mark_warmed():
+    """Отмечает, что кэши лент прогреты."""
+    cache.set(WARMED_KEY, time.time(), None)
+
+
+def warmed_at():
+    """Время прогрева после старта этого процесса или ``None``."""
+    warmed = cache.get(WARMED_KEY)
+    if warmed is None or warmed < STARTED_AT:
+        return None
+    return warmed
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def check_cache():
+    cache.set('health:probe', 1, 10)
+    if cache.get('health:probe') != 1:
+        raise RuntimeError('Кэш не вернул записанное значение')
+
+
+def check_media():
+    # До первой загрузки каталога может ещё не быть.
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=settings.MEDIA_ROOT):
+        pass
+
+
+def check_migrations():
+    global _migrations_applied
+    # Код в процессе не меняется: раз применив все миграции,
+    # больше их не проверяем.
+    if _migrations_applied:
+        return
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise RuntimeError(f'Не применено миграций: {len(plan)}')
+    _migrations_applied = True
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'media': check_media,
+    'migrations': check_migrations,
+}
+
+
+def readiness():
+    """Результат проверок, не чаще раза в ``READINESS_CACHE_SECONDS``."""
+    global _result, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _result is None or now - _checked_at >= (
+                settings.READINESS_CACHE_SECONDS):
+            checks = {}
+            for name, check in CHECKS.items():
+                try:
+                    check()
+                except Exception as error:
+                    checks[name] = str(error) or type(error).__name__
+                else:
+                    checks[name] = 'ok'
+            try:
+                warmed = warmed_at()
+            except Exception:
+                warmed = None
+            _result = {
+                'status': 'ok' if all(
+                    value == 'ok' for value in checks.values()) else 'fail',
+                'checks': checks,
+                'warmed': warmed is not None,
+                'warmed_at': warmed,
+            }
+            _checked_at = now
+        return _result
+
+
+def reset():
+    """Забывает закэшированный результат проверок."""
+    global _result, _migrations_applied
+    with _lock:
+        _result = None
+        _migrations_applied = False
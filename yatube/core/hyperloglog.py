@@ -0,0 +1,53 @@
+"""Приблизительный подсчёт уникальных значений (HyperLogLog).
+
+Скетч из ``2 ** precision`` однобайтовых регистров даёт ошибку около
+``1.04 / sqrt(2 ** precision)``, а сжатым хранится в базе компактно:
+у поста с небольшим числом читателей почти все регистры нулевые.
+"""
+import hashlib
+import math
+import zlib
+
+PRECISION = 10
+
+
+class HyperLogLog:
+    def __init__(self, registers=None, precision=PRECISION):
+        self.precision = precision
+        size = 1 << precision
+        self.registers = bytearray(registers or size)
+        if len(self.registers) != size:
+            raise ValueError('Размер скетча не совпадает с точностью')
+
+    @classmethod
+    def from_bytes(cls, data, precision=PRECISION):
+        return cls(zlib.decompress(data) if data else None, precision)
+
+    def to_bytes(self):
+        return zlib.compress(bytes(self.registers), 9)
+
+    def add(self, value):
+        digest = hashlib.blake2b(
+            str(value).encode(), digest_size=8).digest()
+        number = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = number >> bits
+        rest = number & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(
+            max(pair) for pair in zip(self.registers, other.registers))
+
+    def count(self):
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(
+            2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # Для малых значений точнее подсчёт по пустым регистрам.
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
@@ -0,0 +1,141 @@
+"""Журнал в формате JSON Lines с записью в отдельном потоке.
+
+``AsyncJSONHandler`` только кладёт запись в очередь; поток-слушатель
+забирает всё, что накопилось, и пишет пачкой одним вызовом ``write``.
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+from django.conf import settings
+
+# Атрибуты LogRecord, которые не считаются дополнительными полями.
+RESERVED = frozenset(logging.makeLogRecord({}).__dict__) | {'message'}
+
+_STOP = object()
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED:
+                data[key] = value
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _Flush:
+    """Метка в очереди: слушатель отмечает её, записав всё до неё."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class AsyncJSONHandler(logging.handlers.QueueHandler):
+    """Обработчик, который не пишет на диск в потоке запроса.
+
+    Файл (по умолчанию ``settings.LOG_FILE``) открывается при первой
+    записи, так что настройка журнала (импорт настроек, ``manage.py
+    check``) файлов не создаёт.
+    """
+
+    flush_timeout = 5
+
+    def __init__(self, filename=None, batch_size=500):
+        super().__init__(queue.SimpleQueue())
+        self.filename = filename or settings.LOG_FILE
+        self.stream = None
+        self.batch_size = batch_size
+        self.formatter = JSONFormatter()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def prepare(self, record):
+        # Аргументы и трассировку подставляем сразу: объекты из них
+        # могут измениться, пока запись ждёт в очереди.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._closed:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        super().enqueue(record)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.stream is None:
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+                self.stream = open(self.filename, 'a', encoding='utf-8')
+            # После fork очередь и поток родителя не переносятся.
+            self.queue = queue.SimpleQueue()
+            self._thread = threading.Thread(
+                target=self._listen, name='json-log-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [
+                self.formatter.format(record) + '\n' for record in batch
+                if record is not _STOP and not isinstance(record, _Flush)
+            ]
+            if lines:
+                self.stream.write(''.join(lines))
+                self.stream.flush()
+            for record in batch:
+                if isinstance(record, _Flush):
+                    record.done.set()
+            if _STOP in batch:
+                return
+
+    def _running(self):
+        return self._thread is not None and self._pid == os.getpid()
+
+    def flush(self):
+        """Дожидается записи всего, что уже в очереди; поток-слушатель
+        продолжает работать."""
+        if self._running() and self._thread.is_alive():
+            marker = _Flush()
+            self.queue.put(marker)
+            marker.done.wait(self.flush_timeout)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._running():
+                self.queue.put(_STOP)
+                self._thread.join(self.flush_timeout)
+                self._pid = None
+            if self.stream is not None and not self.stream.closed:
+                self.stream.close()
+        super().close()
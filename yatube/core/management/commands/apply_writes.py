@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.write_behind import apply_batch, get_queue
+
+
+class Command(BaseCommand):
+    help = ('Применяет к БД действия из очереди отложенной записи. '
+            'Без --once работает, пока его не остановят.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=0.5)
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        while True:
+            applied = apply_batch(options['batch'])
+            if options['once'] and not len(get_queue()):
+                break
+            if not applied:
+                time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """Строки ``-X importtime``: список (своё, всего, модуль) в мкс."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        rows.append((int(own), int(total), name.strip()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = ('Показывает самые дорогие импорты при запуске процесса. '
+            'Импорт выполняется в отдельном интерпретаторе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='yatube.wsgi')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('self', 'cumulative'), default='cumulative')
+        parser.add_argument(
+            '--preload', action='store_true',
+            help='После импорта выполнить core.preload.preload().')
+
+    def handle(self, *args, **options):
+        code = f'import {options["module"]}'
+        if options['preload']:
+            code += '; from core.preload import preload; preload()'
+        # Проект импортируется из BASE_DIR, откуда бы ни была запущена
+        # команда (например, python yatube/manage.py из корня репозитория).
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        rows = parse_importtime(result.stderr)
+        column = 0 if options['sort'] == 'self' else 1
+        rows.sort(key=lambda row: row[column], reverse=True)
+        self.stdout.write(f'{"своё, мс":>10} {"всего, мс":>10}  модуль')
+        for own, total, name in rows[:options['top']]:
+            self.stdout.write(
+                f'{own / 1000:10.1f} {total / 1000:10.1f}  {name}')
+        self.stdout.write(
+            f'Модулей: {len(rows)}, всего '
+            f'{sum(row[0] for row in rows) / 1000:.1f} мс')
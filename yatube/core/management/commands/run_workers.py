@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.tasks import claim, ensure_periodic, run_task
+
+
+class Command(BaseCommand):
+    help = ('Выполняет фоновые задачи из очереди в пуле процессов. '
+            'Без --once работает, пока его не остановят.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Число процессов; 0 — выполнять задачи в этом процессе.')
+        parser.add_argument('--batch', type=int, default=20)
+        parser.add_argument('--interval', type=float, default=1)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых задач не останется.')
+
+    def handle(self, *args, **options):
+        ensure_periodic()
+        pool = None
+        if options['workers']:
+            connections.close_all()
+            # Соединения с SQLite нельзя переносить через fork.
+            pool = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup)
+        try:
+            self.loop(pool, options)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def loop(self, pool, options):
+        done = failed = 0
+        while True:
+            tasks = claim(options['batch'])
+            if not tasks:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            if pool is None:
+                results = [run_task(task) for task in tasks]
+            else:
+                results = list(pool.map(run_task, tasks))
+            done += results.count(True)
+            failed += results.count(False)
+        self.stdout.write(
+            f'Выполнено задач: {done}, с ошибкой: {failed}')
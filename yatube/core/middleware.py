@@ -0,0 +1,277 @@
+import logging
+import mimetypes
+import os
+import posixpath
+import random
+import time
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .compression import (
+    ENCODINGS, EXTENSIONS, compress, compress_stream, minify_html,
+)
+from .health import readiness
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+request_logger = logging.getLogger('yatube.requests')
+
+
+def _quality(params):
+    for param in params:
+        key, _, value = param.partition('=')
+        if key.strip() == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0
+    return 1
+
+
+def accepted_encodings(header):
+    """Кодировки из ``Accept-Encoding``, кроме запрещённых через q=0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if coding and _quality(params) > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из ``STATIC_ROOT`` до остальных middleware.
+
+    Файлы с хэшем в имени кэшируются навсегда, остальные — на
+    ``STATIC_MAX_AGE`` секунд. Если клиент принимает brotli или gzip,
+    отдаётся заранее сжатая копия, созданная при ``collectstatic``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = settings.STATIC_ROOT
+        self.max_age = getattr(settings, 'STATIC_MAX_AGE', 60)
+        self.hashed_names = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request):
+        if (self.root and request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(self.prefix)):
+            response = self.serve(
+                request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        name = posixpath.normpath(unquote(name)).lstrip('/')
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        served, content_encoding = path, None
+        for encoding, extension in EXTENSIONS.items():
+            if encoding in accepted and os.path.isfile(path + extension):
+                served, content_encoding = path + extension, encoding
+                break
+        stat = os.stat(served)
+        if not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                stat.st_mtime, stat.st_size):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(
+                open(served, 'rb'),
+                content_type=content_type or 'application/octet-stream',
+                filename=os.path.basename(path),
+            )
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            if content_encoding:
+                response['Content-Encoding'] = content_encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if name in self.hashed_names:
+            patch_cache_control(
+                response, public=True, max_age=IMMUTABLE_MAX_AGE,
+                immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+
+class CompressionMiddleware:
+    """Минифицирует HTML и сжимает ответы gzip или brotli.
+
+    Ответы короче ``COMPRESS_MIN_SIZE`` байт и уже сжатые ответы
+    (например, готовые копии из кэша) не трогаются, потоковые ответы
+    сжимаются по частям.
+    """
+
+    compressible_types = (
+        'text/', 'application/json', 'application/javascript',
+        'application/xml', 'image/svg+xml',
+    )
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESS_MIN_SIZE', 500)
+        self.minify = getattr(settings, 'HTML_MINIFY', True)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.compressible_types):
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        if self.minify and content_type.startswith('text/html'):
+            self.minify_response(response)
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next(
+            (encoding for encoding in ENCODINGS if encoding in accepted),
+            None)
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_size:
+                return response
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    def minify_response(self, response):
+        if response.streaming:
+            return
+        html = response.content.decode(response.charset)
+        response.content = minify_html(html).encode(response.charset)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+
+
+class HealthCheckMiddleware:
+    """Отвечает на проверки живости и готовности до сессий и авторизации,
+    не проверяя Host и не записывая запрос в журнал.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info == settings.HEALTH_LIVENESS_PATH:
+            response = JsonResponse({'status': 'ok'})
+        elif request.path_info == settings.HEALTH_READINESS_PATH:
+            result = readiness()
+            response = JsonResponse(
+                result, status=200 if result['status'] == 'ok' else 503)
+        else:
+            return self.get_response(request)
+        patch_cache_control(response, no_store=True)
+        return response
+
+
+class RequestLogMiddleware:
+    """Пишет в журнал view, статус, время ответа, пользователя и число
+    запросов к БД.
+
+    Ошибки и медленные ответы пишутся всегда, остальные — с вероятностью
+    ``LOG_REQUEST_SAMPLE_RATE``. Исключение из view попадает в ту же
+    запись, поэтому ``django.request`` в JSON не пишется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.LOG_REQUEST_SAMPLE_RATE
+        self.slow_ms = settings.LOG_SLOW_REQUEST_MS
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_queries(execute, *args):
+            queries[0] += 1
+            return execute(*args)
+
+        started = time.monotonic()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        latency_ms = round((time.monotonic() - started) * 1000, 1)
+        status = response.status_code
+        if status >= 500:
+            level = logging.ERROR
+        elif status >= 400 or latency_ms >= self.slow_ms:
+            level = logging.WARNING
+        elif random.random() < self.sample_rate:
+            level = logging.INFO
+        else:
+            return response
+        match = request.resolver_match
+        # Пользователь берётся, только если его уже загрузили для view.
+        user = getattr(request, '_cached_user', None)
+        request_logger.log(
+            level, '%s %s %s', request.method, request.path, status,
+            exc_info=getattr(request, '_logged_exception', None),
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': status,
+                'latency_ms': latency_ms,
+                'user_id': getattr(user, 'pk', None),
+                'queries': queries[0],
+            })
+        return response
+
+    def process_exception(self, request, exception):
+        request._logged_exception = exception
+
+
+class FragmentMiddleware:
+    """Отмечает запросы страниц без общей обёртки сайта.
+
+    Оболочка приложения (``/shell/``) запрашивает содержимое
+    страниц с заголовком ``X-Fragment: 1`` и получает только блок
+    ``content`` шаблона: шапка и подвал у неё уже есть. Заголовок
+    ``X-Fragment-User`` ответа подсказывает ей, что закэшированная
+    шапка показывает другого пользователя.
+    """
+
+    header = 'HTTP_X_FRAGMENT'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.fragment = request.META.get(self.header) == '1'
+        response = self.get_response(request)
+        if request.fragment:
+            user = getattr(request, 'user', None)
+            response['X-Fragment-User'] = str(getattr(user, 'pk', '') or '')
+        patch_vary_headers(response, ['X-Fragment'])
+        return response
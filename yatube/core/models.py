@@ -11,3 +11,41 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Task(CreatedModel):
+    """Фоновая задача из очереди ``core.tasks``."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы (JSON)', default='[[], {}]')
+    key = models.CharField(
+        'Ключ для исключения дублей',
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True
+    )
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING)
+    run_at = models.DateTimeField('Запустить после', db_index=True)
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Предел попыток', default=5)
+    claim = models.CharField(max_length=32, blank=True, db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return self.name
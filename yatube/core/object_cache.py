@@ -0,0 +1,95 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+
+class ObjectCache:
+    """Кэш объектов модели по первичному и естественному ключу.
+
+    Объекты читаются сквозь кэш и сбрасываются сигналами сохранения
+    и удаления. Естественный ключ (slug, username) указывает на первичный.
+    Если задан ``fields``, загружаются и кэшируются только эти поля:
+    так в общий кэш не попадают, например, хэши паролей.
+    """
+
+    def __init__(self, model, natural_key=None, timeout=300, fields=None):
+        self.model = model
+        self.natural_key = natural_key
+        self.timeout = timeout
+        self.fields = fields
+        self.prefix = f'object:{model._meta.label_lower}'
+        post_save.connect(self.invalidate, sender=model, weak=False)
+        post_delete.connect(self.invalidate, sender=model, weak=False)
+
+    def _queryset(self):
+        queryset = self.model._default_manager.all()
+        if self.fields:
+            queryset = queryset.only(*self.fields)
+        return queryset
+
+    def _pk_key(self, pk):
+        return f'{self.prefix}:pk:{pk}'
+
+    def _natural_cache_key(self, value):
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f'{self.prefix}:{self.natural_key}:{digest}'
+
+    def get_many(self, pks):
+        """Возвращает словарь {pk: объект} одним походом в кэш и в БД."""
+        keys = {self._pk_key(pk): pk for pk in pks}
+        found = {
+            keys[key]: obj for key, obj in cache.get_many(keys).items()
+        }
+        missing = [pk for pk in keys.values() if pk not in found]
+        if missing:
+            loaded = self._queryset().in_bulk(missing)
+            cache.set_many(
+                {self._pk_key(pk): obj for pk, obj in loaded.items()},
+                self.timeout)
+            found.update(loaded)
+        return found
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def get_by_natural_key(self, value):
+        pk = cache.get(self._natural_cache_key(value))
+        if pk is not None:
+            obj = self.get(pk)
+            # Ключ мог смениться после того, как ссылка попала в кэш.
+            if obj is not None and getattr(obj, self.natural_key) == value:
+                return obj
+        obj = self._queryset().filter(**{self.natural_key: value}).first()
+        if obj is not None:
+            cache.set_many({
+                self._natural_cache_key(value): obj.pk,
+                self._pk_key(obj.pk): obj,
+            }, self.timeout)
+        return obj
+
+    def get_or_404(self, **lookup):
+        """``get_object_or_404`` по ``pk`` или по естественному ключу."""
+        (field, value), = lookup.items()
+        if field == 'pk':
+            obj = self.get(value)
+        elif field == self.natural_key:
+            obj = self.get_by_natural_key(value)
+        else:
+            raise TypeError(f'Поиск по полю {field} не кэшируется')
+        if obj is None:
+            raise Http404(
+                f'No {self.model._meta.object_name} matches the given query.')
+        return obj
+
+    def forget(self, pks):
+        """Сбрасывает объекты, удалённые в обход сигналов."""
+        cache.delete_many([self._pk_key(pk) for pk in pks])
+
+    def invalidate(self, sender, instance, **kwargs):
+        keys = [self._pk_key(instance.pk)]
+        if self.natural_key:
+            keys.append(
+                self._natural_cache_key(getattr(instance, self.natural_key)))
+        cache.delete_many(keys)
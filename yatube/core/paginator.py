@@ -0,0 +1,115 @@
+import hashlib
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Count, Max
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .versions import bump_version, get_version
+
+
+def _version_name(model):
+    return f'count:{model._meta.label_lower}'
+
+
+def _gaps_version_name(model):
+    return f'count-gaps:{model._meta.label_lower}'
+
+
+def bump_count_version(model, deleted=False):
+    """Сбрасывает закэшированные количества объектов модели.
+
+    После удаления строк (``deleted=True``) сбрасывается и число
+    пропусков в первичных ключах, на котором строится оценка.
+    """
+    bump_version(_version_name(model))
+    if deleted:
+        bump_version(_gaps_version_name(model))
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, который не считает COUNT(*) при каждом просмотре.
+
+    Количество объектов кэшируется на ``count_timeout`` секунд и
+    сбрасывается ``bump_count_version`` при записи. Если в таблице
+    больше ``estimate_threshold`` строк, для выборки без фильтров
+    берётся оценка: максимальный первичный ключ минус число пропусков
+    в ключах. Пропуски считаются одним COUNT(*) и кэшируются до
+    следующего удаления строк, но не дольше ``gaps_timeout`` секунд.
+    Если оценка всё же завысила число страниц, пустая страница после
+    первой вызывает ``EmptyPage``.
+
+    Выборка с фильтром тоже оценивается, если передать её же без
+    фильтра в ``unfiltered`` и отброшенные фильтром строки в
+    ``excluded``: их обычно мало, и посчитать их дёшево.
+    """
+
+    count_timeout = 300
+    gaps_timeout = 3600
+    estimate_threshold = 10000
+    window = 2
+
+    def __init__(self, object_list, per_page, *args, unfiltered=None,
+                 excluded=None, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.unfiltered = unfiltered
+        self.excluded = excluded
+
+    def page(self, number):
+        page = super().page(number)
+        if page.number > 1 and not page.object_list:
+            raise EmptyPage(_('That page contains no results'))
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        first = max(1, page.number - self.window)
+        last = min(self.num_pages, page.number + self.window)
+        # Номера страниц рядом с текущей вместо полного page_range.
+        page.page_window = range(first, last + 1)
+        return page
+
+    def _count_key(self):
+        query = self.object_list.query
+        sql, params = query.sql_with_params()
+        digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        version = get_version(_version_name(query.model))
+        return f'count:{query.model._meta.label_lower}:{version}:{digest}'
+
+    def _estimate(self):
+        if self.unfiltered is None:
+            query = self.object_list.query
+        else:
+            query = self.unfiltered.query
+        sliced = query.low_mark or query.high_mark is not None
+        if query.where or query.distinct or sliced:
+            return None
+        manager = query.model._default_manager
+        last = manager.aggregate(last=Max('pk'))['last'] or 0
+        if last < self.estimate_threshold:
+            return None
+        name = _gaps_version_name(query.model)
+        key = f'{name}:{get_version(name)}'
+        gaps = cache.get(key)
+        if gaps is None:
+            rows = manager.aggregate(last=Max('pk'), count=Count('pk'))
+            gaps = (rows['last'] or 0) - rows['count']
+            cache.set(key, gaps, self.gaps_timeout)
+        estimate = last - gaps
+        if self.unfiltered is not None and self.excluded is not None:
+            estimate = max(estimate - self.excluded.count(), 0)
+        return estimate
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        key = self._count_key()
+        count = cache.get(key)
+        if count is None:
+            count = self._estimate()
+            if count is None:
+                count = self.object_list.count()
+            cache.set(key, count, self.count_timeout)
+        return count
@@ -0,0 +1,59 @@
+"""Подготовка процесса до fork рабочих процессов сервера.
+
+Под ``gunicorn --preload`` приложение импортируется один раз в главном
+процессе; всё, что сделано здесь, рабочие процессы получают готовым
+и общим по памяти, а не повторяют на первом запросе.
+"""
+import importlib
+import os
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+
+def load_modules():
+    """Импортирует модули, которые приложение грузит только по требованию."""
+    for name in settings.PRELOAD_MODULES:
+        importlib.import_module(name)
+    return len(settings.PRELOAD_MODULES)
+
+
+def populate_urls():
+    """Заполняет таблицы разрешения и обращения адресов."""
+    resolver = get_resolver()
+    resolver.reverse_dict
+    return len(resolver.url_patterns)
+
+
+def template_names(engine):
+    for directory in engine.template_dirs:
+        directory = str(directory)
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.endswith(('.html', '.txt')):
+                    path = os.path.join(root, file)
+                    yield os.path.relpath(path, directory).replace(
+                        os.sep, '/')
+
+
+def compile_templates():
+    """Компилирует шаблоны, чтобы они попали в кэширующий загрузчик."""
+    count = 0
+    for engine in engines.all():
+        for name in set(template_names(engine)):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                continue
+            count += 1
+    return count
+
+
+def preload():
+    """Выполняет все шаги и возвращает, сколько объектов подготовлено."""
+    return {
+        'modules': load_modules(),
+        'urls': populate_urls(),
+        'templates': compile_templates(),
+    }
@@ -0,0 +1,103 @@
+"""Ограничение частоты запросов к пишущим view."""
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    number, period = rate.split('/')
+    return int(number), PERIODS[period]
+
+
+def _hit(key, period):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, period * 2):
+            return 1
+        return cache.incr(key)
+
+
+def consume(scope, ident, limit, period, now=None):
+    """Тратит запрос из корзины и возвращает, сколько ждать до следующего.
+
+    Корзина пополняется равномерно: к счётчику текущего окна добавляется
+    доля счётчика прошлого окна, которая ещё не «утекла». Ноль значит,
+    что запрос разрешён.
+    """
+    now = time.time() if now is None else now
+    slot, offset = divmod(now, period)
+    prefix = f'ratelimit:{scope}:{ident}'
+    count = _hit(f'{prefix}:{int(slot)}', period)
+    previous = cache.get(f'{prefix}:{int(slot) - 1}', 0)
+    if previous * (1 - offset / period) + count <= limit:
+        return 0
+    return int(period - offset) + 1
+
+
+def client_ip(request):
+    """Адрес клиента с учётом ``TRUSTED_PROXY_COUNT`` прокси перед сайтом.
+
+    Каждый прокси дописывает адрес своего клиента в конец
+    ``X-Forwarded-For``, поэтому адрес клиента — ``n``-й с конца.
+    Всё левее мог подставить сам клиент.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        forwarded = [
+            address.strip() for address in
+            request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+            if address.strip()
+        ]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_idents(request):
+    """Ключи клиента: IP и, для вошедших, пользователь.
+
+    Ключ пользователя — id из сессии: пользователя из базы не читаем.
+    Генератор отдаёт IP первым, и после отказа по IP сессия не читается.
+    """
+    yield 'ip', client_ip(request), settings.RATELIMIT_IP_MULTIPLIER
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is not None:
+        yield 'user', user_id, 1
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Отвечает 429, если клиент превысил ``RATELIMITS[scope]``.
+
+    Для IP лимит умножается на ``RATELIMIT_IP_MULTIPLIER``: за одним
+    адресом может быть много пользователей. Отказ не обращается к базе:
+    сессии хранятся в кэше (``SESSION_ENGINE`` ``cached_db``).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = settings.RATELIMITS.get(scope)
+            if rate and request.method in methods:
+                limit, period = parse_rate(rate)
+                for kind, ident, factor in client_idents(request):
+                    retry_after = consume(
+                        f'{scope}:{kind}', ident, limit * factor, period)
+                    if retry_after:
+                        break
+                if retry_after:
+                    response = HttpResponse(
+                        'Слишком много запросов, попробуйте позже.',
+                        content_type='text/plain; charset=utf-8',
+                        status=429)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
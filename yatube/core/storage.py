@@ -0,0 +1,54 @@
+import os
+
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, StaticFilesStorage,
+)
+
+from .compression import ENCODINGS, EXTENSIONS, compress
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico',
+}
+
+# Файлы меньше этого размера не сжимаются: выигрыш меньше накладных расходов.
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена файлов и сжатые копии ``.gz``/``.br`` рядом с ними.
+
+    Файлы, которых нет в манифесте (например, до первого ``collectstatic``),
+    отдаются по имени без хэша вместо ошибки при рендере шаблона.
+    """
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed = set()
+        for name, hashed_name, done in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(done, Exception):
+                processed.update((name, hashed_name))
+            yield name, hashed_name, done
+        if not dry_run:
+            for name in sorted(processed):
+                self.compress(name)
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        for encoding in ENCODINGS:
+            compressed = compress(content, encoding, level=9)
+            if len(compressed) >= len(content):
+                continue
+            path = self.path(name + EXTENSIONS[encoding])
+            with open(path, 'wb') as output:
+                output.write(compressed)
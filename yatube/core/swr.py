@@ -0,0 +1,140 @@
+"""Пересчёт кэшированных значений без лавины одинаковых запросов.
+
+Значение хранится вместе со сроком свежести и временем, которое ушло на
+его расчёт. Ближе к концу срока запрос с небольшой вероятностью берётся
+за пересчёт заранее (алгоритм XFetch), и чем дороже расчёт, тем раньше.
+Пересчитывает только тот, кто взял ключ-блокировку; остальные в это
+время получают устаревшую копию. Если копии нет совсем, одинаковые
+запросы ждут результата того, кто уже считает.
+
+В кэшированном фрагменте можно оставить «дырку» — метку, которую при
+каждом ответе заменяет функция, зарегистрированная через ``hole``.
+Так в общий фрагмент попадает то, что зависит от пользователя.
+"""
+import math
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+# Во сколько раз дольше срока свежести хранится устаревшая копия.
+STALE_FACTOR = 10
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+BETA = 1.0
+
+_local = threading.local()
+_process_locks = [threading.Lock() for _ in range(64)]
+
+HOLE = re.compile(r'<!--swr-hole (\w+) ([\w-]+)-->')
+
+_holes = {}
+
+
+def hole(name):
+    """Регистрирует функцию ``(context, value) -> html`` для дырки ``name``."""
+    def decorator(function):
+        _holes[name] = function
+        return function
+    return decorator
+
+
+def hole_marker(name, value):
+    value = str(value)
+    if name not in _holes or not re.fullmatch(r'[\w-]+', value):
+        raise ValueError(f'Неверная дырка: {name} {value!r}')
+    return f'<!--swr-hole {name} {value}-->'
+
+
+def fill_hole(name, value, context):
+    return _holes[name](context, value)
+
+
+def fill_holes(content, context):
+    """Заменяет метки дырок во фрагменте на их содержимое."""
+    if '<!--swr-hole ' not in content:
+        return content
+    return mark_safe(HOLE.sub(
+        lambda match: fill_hole(match[1], match[2], context), content))
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def _is_fresh(expires, delta):
+    if getattr(_local, 'force_refresh', False):
+        return False
+    jitter = delta * BETA * math.log(1 - random.random())
+    return time.time() - jitter < expires
+
+
+@contextmanager
+def force_refresh():
+    """Внутри блока значения пересчитываются, даже если они свежие."""
+    previous = getattr(_local, 'force_refresh', False)
+    _local.force_refresh = True
+    try:
+        yield
+    finally:
+        _local.force_refresh = previous
+
+
+def _recompute(key, producer, timeout):
+    started = time.time()
+    value = producer()
+    delta = time.time() - started
+    cache.set(
+        key, (value, time.time() + timeout, delta),
+        timeout * STALE_FACTOR)
+    return value
+
+
+def _release(key):
+    # touch с нулевым сроком освобождает ключ, не сбрасывая кэши процессов.
+    cache.touch(lock_key(key), 0)
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope
+        if not cache.has_key(lock_key(key)):
+            return None
+    return None
+
+
+def get_or_recompute(key, producer, timeout):
+    """Возвращает значение ``key``, пересчитывая его через ``producer``."""
+    envelope = cache.get(key)
+    if envelope is not None:
+        value, expires, delta = envelope
+        if _is_fresh(expires, delta):
+            return value
+        if not cache.add(lock_key(key), 1, LOCK_TIMEOUT):
+            return value
+        try:
+            return _recompute(key, producer, timeout)
+        finally:
+            _release(key)
+
+    with _process_locks[hash(key) % len(_process_locks)]:
+        envelope = cache.get(key)
+        if envelope is not None:
+            return envelope[0]
+        if not cache.add(lock_key(key), 1, LOCK_TIMEOUT):
+            envelope = _wait_for(key)
+            if envelope is not None:
+                return envelope[0]
+            return producer()
+        try:
+            return _recompute(key, producer, timeout)
+        finally:
+            _release(key)
@@ -0,0 +1,140 @@
+"""Очередь фоновых задач в основной БД.
+
+Задача объявляется декоратором ``task`` и ставится в очередь вызовом
+``delay``; выполняет очередь команда ``manage.py run_workers``.
+Неудачные попытки повторяются с экспоненциальной задержкой, а
+периодические задачи после каждого запуска ставят себя снова.
+"""
+import hashlib
+import json
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60 * 60
+
+_registry = {}
+_periodic = {}
+
+
+def task(func=None, *, max_attempts=5, unique=False, every=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    ``unique`` не ставит задачу повторно, пока такая же ждёт в очереди;
+    ``every`` (timedelta) делает задачу периодической.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = func
+        if every is not None:
+            _periodic[name] = (every, max_attempts)
+
+        def schedule(run_at, *args, **kwargs):
+            arguments = json.dumps([args, kwargs], sort_keys=True)
+            key = None
+            if unique:
+                digest = hashlib.md5(arguments.encode()).hexdigest()
+                key = f'{name}:{digest}'
+            return enqueue(name, arguments, run_at, key, max_attempts)
+
+        func.task_name = name
+        func.schedule = schedule
+        func.delay = lambda *args, **kwargs: schedule(None, *args, **kwargs)
+        return func
+    return decorator(func) if func is not None else decorator
+
+
+def enqueue(name, arguments='[[], {}]', run_at=None, key=None,
+            max_attempts=5):
+    defaults = {
+        'name': name,
+        'arguments': arguments,
+        'run_at': run_at or timezone.now(),
+        'max_attempts': max_attempts,
+    }
+    if key is None:
+        return Task.objects.create(**defaults)
+    task, _ = Task.objects.get_or_create(key=key, defaults=defaults)
+    return task
+
+
+def ensure_periodic():
+    """Ставит в очередь периодические задачи, которых там ещё нет."""
+    for name, (every, max_attempts) in _periodic.items():
+        if not Task.objects.filter(name=name).exclude(
+                status=Task.FAILED).exists():
+            enqueue(name, key=f'periodic:{name}', max_attempts=max_attempts)
+
+
+def queue_depth():
+    """Число задач в каждом состоянии."""
+    depth = dict.fromkeys(status for status, _ in Task.STATUSES)
+    for status in depth:
+        depth[status] = Task.objects.filter(status=status).count()
+    return depth
+
+
+def claim(limit, lease=LEASE):
+    """Забирает до ``limit`` готовых задач, включая брошенные упавшим
+    обработчиком, и помечает их выполняемыми на время ``lease``.
+    """
+    now = timezone.now()
+    abandoned = Q(status=Task.RUNNING, locked_until__lt=now)
+    Task.objects.filter(abandoned, attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, last_error='Обработчик не завершил задачу')
+    due = Q(status=Task.PENDING, run_at__lte=now) | abandoned
+    pks = list(Task.objects.filter(due).order_by('run_at').values_list(
+        'pk', flat=True)[:limit])
+    token = uuid.uuid4().hex
+    # Повторная проверка условия не даёт двум обработчикам взять одно.
+    Task.objects.filter(due, pk__in=pks).update(
+        status=Task.RUNNING, claim=token, key=None,
+        locked_until=now + lease, attempts=F('attempts') + 1)
+    return list(Task.objects.filter(claim=token, status=Task.RUNNING))
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_MAX, BACKOFF_BASE ** attempts)
+    return timedelta(seconds=delay * random.uniform(1, 1.5))
+
+
+def run_task(task):
+    """Выполняет забранную задачу и записывает результат."""
+    close_old_connections()
+    func = _registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {task.name} не зарегистрирована')
+        args, kwargs = json.loads(task.arguments)
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Задача %s не выполнена', task.name)
+        error = traceback.format_exc()
+        tasks = Task.objects.filter(pk=task.pk, claim=task.claim)
+        if func is not None and task.attempts < task.max_attempts:
+            tasks.update(
+                status=Task.PENDING, last_error=error, locked_until=None,
+                run_at=timezone.now() + backoff(task.attempts))
+            return False
+        tasks.update(status=Task.FAILED, last_error=error)
+        succeeded = False
+    else:
+        Task.objects.filter(pk=task.pk, claim=task.claim).delete()
+        succeeded = True
+    if task.name in _periodic:
+        every, max_attempts = _periodic[task.name]
+        enqueue(task.name, task.arguments, timezone.now() + every,
+                f'periodic:{task.name}', max_attempts)
+    return succeeded
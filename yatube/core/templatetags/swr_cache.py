@@ -0,0 +1,77 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.swr import fill_hole, fill_holes, get_or_recompute, hole_marker
+
+register = template.Library()
+
+
+class SWRCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time_var, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time_var = expire_time_var
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time_var.resolve(context))
+        except (template.VariableDoesNotExist, ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"swr_cache" tag got an invalid timeout: %r'
+                % self.expire_time_var.var)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+
+        def render():
+            with context.push(swr_cache=True):
+                return self.nodelist.render(context)
+
+        return fill_holes(get_or_recompute(
+            make_template_fragment_key(self.fragment_name, vary_on),
+            render, expire_time), context)
+
+
+class SWRHoleNode(template.Node):
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def render(self, context):
+        value = self.value.resolve(context)
+        if context.get('swr_cache'):
+            return hole_marker(self.name, value)
+        return fill_hole(self.name, str(value), context)
+
+
+@register.tag
+def swr_cache(parser, token):
+    """Как ``{% cache %}``, но без лавины пересчётов при истечении срока.
+
+    {% swr_cache 20 index_page page_obj.number %} ... {% endswr_cache %}
+    """
+    nodelist = parser.parse(('endswr_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            '%r tag requires at least 2 arguments.' % tokens[0])
+    return SWRCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
+
+
+@register.tag
+def swr_hole(parser, token):
+    """Место во фрагменте ``swr_cache``, которое заполняется заново
+    при каждом ответе функцией, зарегистрированной ``core.swr.hole``.
+
+    {% swr_hole likes post.id %}
+    """
+    tokens = token.split_contents()
+    if len(tokens) != 3:
+        raise template.TemplateSyntaxError(
+            '%r tag requires exactly 2 arguments.' % tokens[0])
+    return SWRHoleNode(tokens[1], parser.compile_filter(tokens[2]))
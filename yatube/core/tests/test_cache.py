@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache, TieredCache, _LocalTier
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(f'{self.directory}/cache.sqlite3', {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_add_is_exclusive(self):
+        """add записывает значение, только если ключа ещё нет."""
+        self.assertTrue(self.cache.add('lock', 'first'))
+        self.assertFalse(self.cache.add('lock', 'second'))
+        self.assertEqual(self.cache.get('lock'), 'first')
+
+    def test_incr_keeps_integers(self):
+        """incr увеличивает число внутри SQLite."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_values_are_pickled(self):
+        """Сложные значения и bool переживают сохранение."""
+        self.cache.set_many({'flag': True, 'data': {'a': [1, 2]}})
+        self.assertEqual(
+            self.cache.get_many(['flag', 'data', 'missing']),
+            {'flag': True, 'data': {'a': [1, 2]}})
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'GENERATION_CHECK_INTERVAL': 0}}
+        location = f'{self.directory}/cache.sqlite3'
+        self.worker = TieredCache(location, params)
+        self.other_worker = TieredCache(location, params)
+        # У другого процесса свой локальный уровень.
+        self.other_worker._l1 = _LocalTier(500)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_value_is_shared_between_workers(self):
+        """Значение, записанное одним процессом, видно другому."""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.other_worker.get('key'), 'value')
+
+    def test_overwrite_reaches_other_workers(self):
+        """Новое значение ключа сбрасывает только этот ключ
+        у других процессов.
+        """
+        self.worker.set_many({'key': 'value', 'other': 'value'})
+        self.assertEqual(
+            self.other_worker.get_many(['key', 'other']),
+            {'key': 'value', 'other': 'value'})
+        self.worker.set('key', 'new value')
+        self.assertEqual(self.other_worker.get('key'), 'new value')
+        self.assertIn(':1:other', self.other_worker._l1.entries)
+        self.assertEqual(self.worker.get('key'), 'new value')
+        self.assertIn(':1:key', self.worker._l1.entries)
+
+    def test_incr_reaches_other_workers(self):
+        """Увеличенный счётчик виден другим процессам."""
+        self.worker.set('counter', 1)
+        self.assertEqual(self.other_worker.get('counter'), 1)
+        self.worker.incr('counter')
+        self.assertEqual(self.other_worker.get('counter'), 2)
+
+    def test_missing_log_entry_clears_local_tier(self):
+        """Если запись журнала пропала, процесс сбрасывает свой уровень."""
+        self.other_worker.set('other', 'value')
+        self.assertEqual(self.other_worker.get('other'), 'value')
+        self.worker.set('key', 'value')
+        self.worker._shared.delete('tiered:change:2')
+        self.other_worker.get('key')
+        self.assertIn(':1:other', self.other_worker._l1.entries)
+        self.other_worker.get('key')
+        self.assertNotIn(':1:other', self.other_worker._l1.entries)
+
+    def test_delete_reaches_other_workers(self):
+        """Удаление сбрасывает локальный уровень всех процессов."""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.other_worker.get('key'), 'value')
+        self.worker.delete('key')
+        self.assertIsNone(self.other_worker.get('key'))
+        changes = self.worker._shared.get('tiered:changes')
+        self.worker.delete('missing')
+        self.assertEqual(self.worker._shared.get('tiered:changes'), changes)
+
+    def test_clear_reaches_other_workers(self):
+        """Очистка кэша видна всем процессам."""
+        self.worker.set('key', 'value')
+        self.assertEqual(self.other_worker.get('key'), 'value')
+        self.worker.clear()
+        self.assertIsNone(self.other_worker.get('key'))
+        self.assertIsNone(self.worker.get('key'))
@@ -0,0 +1,56 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.compression import minify_html
+from core.middleware import CompressionMiddleware
+
+PAGE = (
+    '<html>\n  <body>\n' + '    <p>Текст поста</p>\n' * 100
+    + '    <pre>\n  код\n</pre>\n  </body>\n</html>\n'
+)
+
+
+@override_settings(COMPRESS_MIN_SIZE=500, HTML_MINIFY=True)
+class CompressionMiddlewareTest(SimpleTestCase):
+    def process(self, response, **headers):
+        request = RequestFactory().get('/', **headers)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_minify_keeps_pre(self):
+        html = minify_html(PAGE)
+        self.assertNotIn('\n    <p>', html)
+        self.assertIn('<pre>\n  код\n</pre>', html)
+
+    def test_gzip(self):
+        response = self.process(
+            HttpResponse(PAGE), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(response.content).decode(), minify_html(PAGE))
+
+    def test_without_accept_encoding_only_minifies(self):
+        response = self.process(HttpResponse(PAGE))
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response.content.decode(), minify_html(PAGE))
+
+    def test_small_and_compressed_responses_are_skipped(self):
+        response = self.process(
+            HttpResponse('<p>мало</p>'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        cached = HttpResponse(gzip.compress(PAGE.encode()))
+        cached['Content-Encoding'] = 'gzip'
+        response = self.process(cached, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(
+            gzip.decompress(response.content).decode(), PAGE)
+
+    def test_streaming(self):
+        chunks = (line.encode() for line in PAGE.splitlines(True))
+        response = self.process(
+            StreamingHttpResponse(chunks, content_type='text/plain'),
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), PAGE)
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core import health
+
+
+class HealthCheckTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        health.reset()
+        self.addCleanup(health.reset)
+
+    def test_liveness_skips_session_and_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/healthz', HTTP_HOST='10.0.0.7')
+        self.assertEqual(response.json(), {'status': 'ok'})
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_readiness_checks_and_warm_status(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200, response.json())
+        self.assertEqual(set(response.json()['checks'].values()), {'ok'})
+        self.assertFalse(response.json()['warmed'])
+        health.mark_warmed()
+        health.reset()
+        self.assertTrue(self.client.get('/readyz').json()['warmed'])
+
+    def test_warm_up_before_start_does_not_count(self):
+        """Отметка, оставшаяся от прошлого запуска, не считается."""
+        health.mark_warmed()
+        with mock.patch.object(health, 'STARTED_AT', time.time() + 60):
+            health.reset()
+            self.assertFalse(self.client.get('/readyz').json()['warmed'])
+
+    def test_result_is_cached(self):
+        self.client.get('/readyz')
+        with self.assertNumQueries(0):
+            self.client.get('/readyz')
+
+    def test_missing_media_root_is_created(self):
+        shutil.rmtree(self.media)
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checks']['media'], 'ok')
+        self.assertTrue(os.path.isdir(self.media))
+
+    def test_failed_check_returns_503(self):
+        # Каталог нельзя создать: на его месте обычный файл.
+        shutil.rmtree(self.media)
+        open(self.media, 'w').close()
+        self.addCleanup(os.remove, self.media)
+        pending = mock.Mock(
+            side_effect=RuntimeError('Не применено миграций: 1'))
+        with mock.patch.dict(health.CHECKS, migrations=pending):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        checks = response.json()['checks']
+        self.assertNotEqual(checks['media'], 'ok')
+        self.assertEqual(checks['migrations'], 'Не применено миграций: 1')
+        self.assertEqual(checks['database'], 'ok')
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase
+
+from core.hyperloglog import HyperLogLog
+
+
+class HyperLogLogTest(SimpleTestCase):
+    def test_estimate_is_close(self):
+        for number in (10, 1000, 20000):
+            with self.subTest(number=number):
+                sketch = HyperLogLog()
+                for value in range(number):
+                    sketch.add(value)
+                    sketch.add(value)
+                self.assertAlmostEqual(
+                    sketch.count(), number, delta=number * 0.1)
+
+    def test_merge_and_bytes(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for value in range(500):
+            first.add(value)
+            second.add(value + 250)
+        first.merge(second)
+        self.assertAlmostEqual(first.count(), 750, delta=75)
+        data = first.to_bytes()
+        self.assertLess(len(data), len(first.registers))
+        restored = HyperLogLog.from_bytes(data)
+        self.assertEqual(restored.registers, first.registers)
+        self.assertEqual(HyperLogLog.from_bytes(b'').count(), 0)
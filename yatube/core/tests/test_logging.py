@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core.json_logging import AsyncJSONHandler
+
+User = get_user_model()
+
+
+class AsyncJSONHandlerTest(TestCase):
+    def test_records_are_written_as_json_lines(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'logs', 'test.jsonl')
+        handler = AsyncJSONHandler(path)
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('json_logging_test')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        for number in range(3):
+            logger.warning('Запись %s', number, extra={'number': number})
+        try:
+            raise ValueError('Ошибка')
+        except ValueError:
+            logger.exception('С трассировкой')
+        handler.flush()
+        with open(path, encoding='utf-8') as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(
+            [line['message'] for line in lines],
+            ['Запись 0', 'Запись 1', 'Запись 2', 'С трассировкой'])
+        self.assertEqual(lines[2]['number'], 2)
+        self.assertEqual(lines[0]['level'], 'WARNING')
+        self.assertIn('ValueError', lines[3]['exc'])
+
+    def test_file_is_opened_on_first_record(self):
+        """Настройка журнала не создаёт файл; flush не останавливает
+        поток-слушатель."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'logs', 'test.jsonl')
+        handler = AsyncJSONHandler(path)
+        self.addCleanup(handler.close)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+        record = logging.makeLogRecord({'msg': 'Первая'})
+        handler.handle(record)
+        handler.flush()
+        thread = handler._thread
+        handler.handle(logging.makeLogRecord({'msg': 'Вторая'}))
+        handler.flush()
+        self.assertIs(handler._thread, thread)
+        self.assertTrue(thread.is_alive())
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(
+                [json.loads(line)['message'] for line in file],
+                ['Первая', 'Вторая'])
+
+    def test_django_errors_still_reach_admins(self):
+        handlers = {
+            type(handler).__name__
+            for handler in logging.getLogger('django').handlers
+        }
+        self.assertLessEqual(
+            {'StreamHandler', 'AdminEmailHandler', 'AsyncJSONHandler'},
+            handlers)
+
+
+class RequestLogMiddlewareTest(TestCase):
+    @override_settings(LOG_REQUEST_SAMPLE_RATE=0)
+    def test_successful_requests_are_sampled(self):
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            self.client.get('/')
+            self.client.get('/group/missing/')
+        record, = logs.records
+        self.assertEqual(record.status, 404)
+        self.assertEqual(record.view, 'posts:group_posts')
+        self.assertIsNone(record.user_id)
+        self.assertGreater(record.queries, 0)
+
+    def test_server_error_is_logged_once_with_traceback(self):
+        with mock.patch(
+                'posts.views.pagination', side_effect=ValueError('Сломалось')):
+            with self.assertLogs('yatube.requests', 'ERROR') as logs:
+                with self.assertLogs('django.request', 'ERROR'):
+                    # Тестовый клиент передаёт исключение view дальше.
+                    with self.assertRaises(ValueError):
+                        self.client.get('/')
+        record, = logs.records
+        self.assertEqual(record.status, 500)
+        self.assertIs(record.exc_info[0], ValueError)
+        logger = logging.getLogger('django.request')
+        self.assertFalse(logger.propagate)
+        self.assertNotIn('AsyncJSONHandler', {
+            type(handler).__name__ for handler in logger.handlers})
+
+    @override_settings(LOG_REQUEST_SAMPLE_RATE=1)
+    def test_user_id_is_logged(self):
+        user = User.objects.create_user(username='StasBasov')
+        self.client.force_login(user)
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            self.client.get('/follow/')
+        record, = logs.records
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.user_id, user.pk)
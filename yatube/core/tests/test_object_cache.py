@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from core.object_cache import ObjectCache
+
+User = get_user_model()
+
+user_cache = ObjectCache(User, natural_key='username')
+public_user_cache = ObjectCache(
+    User, natural_key='username', fields=('username',))
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user_{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_read_through_by_pk(self):
+        """Повторное чтение по pk не обращается к БД."""
+        user = ObjectCacheTest.users[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(user_cache.get(user.pk), user)
+            self.assertEqual(user_cache.get_or_404(pk=user.pk), user)
+
+    def test_read_through_by_natural_key(self):
+        """Повторное чтение по естественному ключу не обращается к БД."""
+        user = ObjectCacheTest.users[0]
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                user_cache.get_or_404(username=user.username), user)
+            self.assertEqual(
+                user_cache.get_by_natural_key(user.username), user)
+
+    def test_get_many_is_batched(self):
+        """Промахи get_many загружаются одним запросом."""
+        pks = [user.pk for user in ObjectCacheTest.users]
+        user_cache.get(pks[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(user_cache.get_many(pks)), set(pks))
+        with self.assertNumQueries(0):
+            user_cache.get_many(pks)
+
+    def test_save_invalidates(self):
+        """Сохранение объекта сбрасывает его кэш."""
+        user = ObjectCacheTest.users[1]
+        user_cache.get_by_natural_key(user.username)
+        old_username = user.username
+        user.username = 'renamed'
+        user.save()
+        self.assertEqual(user_cache.get(user.pk).username, 'renamed')
+        self.assertIsNone(user_cache.get_by_natural_key(old_username))
+
+    def test_delete_invalidates(self):
+        """Удалённый объект не отдаётся из кэша."""
+        user = User.objects.create_user(username='to_delete')
+        user_cache.get_or_404(username='to_delete')
+        user.delete()
+        with self.assertRaises(Http404):
+            user_cache.get_or_404(username='to_delete')
+
+    def test_only_listed_fields_are_cached(self):
+        """Поля вне ``fields`` (пароль) в кэш не попадают."""
+        user = ObjectCacheTest.users[0]
+        public_user_cache.get_by_natural_key(user.username)
+        cached = cache.get(public_user_cache._pk_key(user.pk))
+        self.assertEqual(cached.username, user.username)
+        self.assertNotIn('password', cached.__dict__)
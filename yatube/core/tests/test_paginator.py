@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+
+from core.paginator import CachedCountPaginator, bump_count_version
+
+User = get_user_model()
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.bulk_create([
+            User(username=f'user_{number}') for number in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.users = User.objects.order_by('pk')
+
+    def test_count_is_cached(self):
+        """COUNT(*) выполняется один раз, пока не сменилась версия."""
+        users = self.users.filter(username__startswith='user_')
+        with self.assertNumQueries(1):
+            self.assertEqual(CachedCountPaginator(users, 5).count, 25)
+            self.assertEqual(CachedCountPaginator(users, 5).count, 25)
+        User.objects.create(username='user_new')
+        bump_count_version(User)
+        self.assertEqual(CachedCountPaginator(users, 5).count, 26)
+
+    def test_page_window(self):
+        """Страница знает только соседние номера страниц."""
+        paginator = CachedCountPaginator(self.users, 2)
+        self.assertEqual(list(paginator.page(1).page_window), [1, 2, 3])
+        self.assertEqual(
+            list(paginator.page(7).page_window), [5, 6, 7, 8, 9])
+        self.assertEqual(list(paginator.page(13).page_window), [11, 12, 13])
+
+    def test_large_unfiltered_count_is_estimated(self):
+        """Для большой таблицы без фильтров берётся оценка по pk
+        с учётом пропусков, посчитанных после последнего удаления."""
+        paginator = CachedCountPaginator(self.users, 5)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 25)
+        User.objects.filter(username__in=['user_0', 'user_1']).delete()
+        User.objects.create(username='user_new')
+        bump_count_version(User, deleted=True)
+        paginator = CachedCountPaginator(self.users, 5)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 24)
+        with self.assertNumQueries(2):
+            User.objects.create(username='user_newer')
+            bump_count_version(User)
+            paginator = CachedCountPaginator(self.users, 5)
+            paginator.estimate_threshold = 1
+            self.assertEqual(paginator.count, 25)
+        filtered = CachedCountPaginator(
+            self.users.filter(username__startswith='user_1'), 5)
+        filtered.estimate_threshold = 1
+        self.assertEqual(filtered.count, 10)
+
+    def test_excluded_rows_are_subtracted_from_estimate(self):
+        """Оценка выборки с исключением — оценка без него минус
+        исключённые строки."""
+        excluded = self.users.filter(username__in=['user_3', 'user_4'])
+        paginator = CachedCountPaginator(
+            self.users.exclude(pk__in=excluded.values('pk')), 5,
+            unfiltered=self.users, excluded=excluded)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 23)
+
+    def test_overestimated_page_is_empty_page(self):
+        """Страница за концом выборки при завышенной оценке — EmptyPage."""
+        paginator = CachedCountPaginator(self.users, 5)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.num_pages, 5)
+        User.objects.filter(username__startswith='user_2').delete()
+        with self.assertRaises(EmptyPage):
+            paginator.page(5)
+        self.assertEqual(len(paginator.page(4)), 4)
@@ -0,0 +1,42 @@
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+
+from core.management.commands.profile_imports import parse_importtime
+from core.preload import preload
+
+
+class PreloadTest(SimpleTestCase):
+    def test_preload_fills_resolver_and_template_cache(self):
+        get_resolver.cache_clear()
+        result = preload()
+        self.assertTrue(get_resolver()._populated)
+        self.assertGreater(result['templates'], 0)
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   posts.hidden\n'
+            'import time:      1500 |       2000 | posts.views\n'
+            'Traceback (most recent call last):\n'
+        )
+        self.assertEqual(parse_importtime(output), [
+            (120, 120, 'posts.hidden'),
+            (1500, 2000, 'posts.views'),
+        ])
+
+    def test_profile_imports_command(self):
+        """Команда работает, даже если запущена не из каталога проекта."""
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(os.path.dirname(settings.BASE_DIR))
+        out = StringIO()
+        call_command('profile_imports', module='core', top=3, stdout=out)
+        self.assertIn('core', out.getvalue())
+        self.assertIn('Модулей:', out.getvalue())
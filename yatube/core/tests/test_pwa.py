@@ -0,0 +1,69 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class AppShellTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+
+    def test_fragment_has_no_site_wrapper(self):
+        full = self.client.get(reverse('posts:index'))
+        self.assertContains(full, '<html')
+        self.assertContains(full, 'rel="manifest"')
+        self.assertIn('X-Fragment', full['Vary'])
+        self.assertNotIn('X-Fragment-User', full)
+        fragment = self.client.get(
+            reverse('posts:index'), HTTP_X_FRAGMENT='1')
+        self.assertEqual(fragment.status_code, 200)
+        self.assertNotContains(fragment, '<html')
+        self.assertNotContains(fragment, '<header')
+        self.assertNotContains(fragment, '<footer')
+        self.assertIn('X-Fragment', fragment['Vary'])
+        self.assertEqual(fragment['X-Fragment-User'], '')
+
+    def test_fragment_names_user(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('posts:follow_index'), HTTP_X_FRAGMENT='1')
+        self.assertEqual(response['X-Fragment-User'], str(self.user.pk))
+
+    def test_shell(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('app_shell'))
+        self.assertContains(response, 'data-shell')
+        self.assertContains(response, f'data-user="{self.user.pk}"')
+        self.assertContains(response, '<header')
+
+    def test_service_worker(self):
+        response = self.client.get(reverse('service_worker'))
+        self.assertTrue(
+            response['Content-Type'].startswith('application/javascript'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        config = json.loads(re.search(
+            r'const CONFIG = (.*);', response.content.decode()).group(1))
+        self.assertIn(reverse('app_shell'), config['assets'])
+        self.assertIn('/static/js/app.js', config['assets'])
+        self.assertTrue(any(
+            re.match(route, reverse('posts:group_posts', args=['cats']))
+            for route in config['shellRoutes']))
+        self.assertFalse(any(
+            re.match(route, reverse('posts:post_create'))
+            for route in config['shellRoutes']))
+        self.assertRegex(
+            reverse('posts:post_detail', args=[1]), config['postRoute'])
+
+    def test_manifest(self):
+        response = self.client.get(reverse('manifest'))
+        self.assertEqual(
+            response['Content-Type'], 'application/manifest+json')
+        data = response.json()
+        self.assertEqual(data['start_url'], reverse('posts:index'))
+        self.assertEqual(data['display'], 'standalone')
@@ -0,0 +1,56 @@
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.ratelimit import client_idents, client_ip, consume, parse_rate
+
+
+class ConsumeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('5/h'), (5, 3600))
+
+    def test_bucket_refills_over_time(self):
+        """После лимита запросы снова разрешаются по мере пополнения."""
+        start = 6000
+        for _ in range(3):
+            self.assertEqual(consume('test', 'ip', 3, 60, now=start), 0)
+        self.assertEqual(consume('test', 'ip', 3, 60, now=start + 1), 60)
+        # В начале следующего окна прошлое ещё почти целиком учитывается.
+        self.assertTrue(consume('test', 'ip', 3, 60, now=start + 61))
+        self.assertEqual(consume('test', 'ip', 3, 60, now=start + 110), 0)
+
+    def test_clients_do_not_share_buckets(self):
+        self.assertEqual(consume('test', 'first', 1, 60, now=6000), 0)
+        self.assertEqual(consume('test', 'second', 1, 60, now=6000), 0)
+
+
+class ClientIdentsTest(SimpleTestCase):
+    def request(self, forwarded=None):
+        meta = {'REMOTE_ADDR': '10.0.0.1'}
+        if forwarded:
+            meta['HTTP_X_FORWARDED_FOR'] = forwarded
+        request = RequestFactory().post('/', **meta)
+        request.session = {}
+        return request
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertEqual(client_ip(self.request('1.2.3.4')), '10.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_behind_proxy(self):
+        """Адрес, который клиент подставил сам, не учитывается."""
+        self.assertEqual(
+            client_ip(self.request('6.6.6.6, 1.2.3.4')), '1.2.3.4')
+        self.assertEqual(client_ip(self.request()), '10.0.0.1')
+
+    def test_user_bucket_is_keyed_on_user(self):
+        """Ключ пользователя берётся из сессии."""
+        request = self.request()
+        self.assertEqual(
+            [kind for kind, _, _ in client_idents(request)], ['ip'])
+        request.session[SESSION_KEY] = '7'
+        self.assertIn(('user', '7', 1), list(client_idents(request)))
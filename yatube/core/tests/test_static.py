@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.middleware import accepted_encodings
+
+STYLE = 'body { margin: 0; }\n' * 100
+
+
+class StaticPipelineTest(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, root)
+        os.mkdir(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write(STYLE)
+        settings = override_settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=root,
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(root, 'staticfiles.json')) as manifest:
+            self.hashed = json.load(manifest)['paths']['css/site.css']
+        self.root = root
+
+    def test_collectstatic_writes_gzip_copies(self):
+        """Рядом с хэшированным файлом лежит сжатая копия."""
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        path = os.path.join(self.root, self.hashed)
+        with gzip.open(path + '.gz', 'rt') as compressed:
+            self.assertEqual(compressed.read(), STYLE)
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        response = self.client.get(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), STYLE)
+
+    def test_plain_file_without_accept_encoding(self):
+        response = self.client.get('/static/css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(), STYLE)
+
+    def test_not_modified(self):
+        response = self.client.get(f'/static/{self.hashed}')
+        response = self.client.get(
+            f'/static/{self.hashed}',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_file_and_traversal_fall_through(self):
+        self.assertEqual(
+            self.client.get('/static/css/missing.css').status_code, 404)
+        self.assertEqual(
+            self.client.get('/static/../settings.py').status_code, 404)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=1.0, br;q=0, identity'),
+            {'gzip', 'identity'})
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from core.swr import force_refresh, get_or_recompute, hole, lock_key
+
+
+@hole('greeting')
+def greeting(context, value):
+    return f'{context["name"]}:{value}'
+
+
+class GetOrRecomputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def producer(self):
+        self.calls += 1
+        time.sleep(0.1)
+        return f'value {self.calls}'
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берётся из кэша."""
+        get_or_recompute('key', self.producer, 60)
+        self.assertEqual(get_or_recompute('key', self.producer, 60), 'value 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_refreshing(self):
+        """Пока другой запрос пересчитывает, отдаётся устаревшая копия."""
+        cache.set('key', ('stale', time.time() - 1, 0), 60)
+        cache.add(lock_key('key'), 1, 30)
+        self.assertEqual(get_or_recompute('key', self.producer, 60), 'stale')
+        self.assertEqual(self.calls, 0)
+
+    def test_expired_value_is_recomputed(self):
+        """Устаревшее значение пересчитывает тот, кто взял блокировку."""
+        cache.set('key', ('stale', time.time() - 1, 0), 60)
+        self.assertEqual(get_or_recompute('key', self.producer, 60), 'value 1')
+        self.assertTrue(cache.add(lock_key('key'), 1, 30))
+
+    def test_concurrent_misses_are_coalesced(self):
+        """Одновременные запросы без копии ждут одного пересчёта."""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_or_recompute('key', self.producer, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['value 1'] * 5)
+
+    def test_force_refresh(self):
+        """force_refresh пересчитывает даже свежее значение."""
+        get_or_recompute('key', self.producer, 60)
+        with force_refresh():
+            self.assertEqual(
+                get_or_recompute('key', self.producer, 60), 'value 2')
+
+
+class SWRHoleTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_hole_is_filled_on_every_render(self):
+        """Дырка во фрагменте заполняется по контексту каждого ответа."""
+        template = Template(
+            '{% load swr_cache %}'
+            '{% swr_cache 60 holes %}[{% swr_hole greeting 7 %}]'
+            '{% endswr_cache %}{% swr_hole greeting 8 %}')
+        self.assertEqual(
+            template.render(Context({'name': 'first'})), '[first:7]first:8')
+        self.assertEqual(
+            template.render(Context({'name': 'second'})),
+            '[second:7]second:8')
@@ -0,0 +1,101 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task(unique=True)
+def remember(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def explode():
+    raise ValueError('Ошибка')
+
+
+@tasks.task
+def hourly():
+    calls.append('hourly')
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        # Периодические задачи приложений здесь не нужны.
+        periodic = mock.patch.dict(tasks._periodic, clear=True)
+        periodic.start()
+        self.addCleanup(periodic.stop)
+
+    def run_workers(self):
+        call_command('run_workers', workers=0, once=True, stdout=StringIO())
+
+    def test_delay_and_run(self):
+        remember.delay('a')
+        remember.delay('a')
+        remember.delay('b')
+        self.assertEqual(Task.objects.count(), 2)
+        self.run_workers()
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_scheduled_task_waits(self):
+        remember.schedule(timezone.now() + timedelta(minutes=5), 'later')
+        self.run_workers()
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get().status, Task.PENDING)
+
+    def test_retry_with_backoff_then_fail(self):
+        explode.delay()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.run_workers()
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('ValueError', task.last_error)
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.run_workers()
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+
+    def test_abandoned_task_is_claimed_again(self):
+        remember.delay('lost')
+        tasks.claim(10)
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.run_workers()
+        self.assertEqual(calls, ['lost'])
+
+    def test_periodic_task_reschedules_itself(self):
+        periodic = {hourly.task_name: (timedelta(hours=1), 5)}
+        with mock.patch.dict(tasks._periodic, periodic):
+            self.run_workers()
+        self.assertEqual(calls, ['hourly'])
+        task = Task.objects.get()
+        self.assertEqual(task.name, hourly.task_name)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(minutes=59))
+
+    def test_admin_shows_queue_depth(self):
+        remember.delay('a')
+        explode.delay()
+        Task.objects.filter(name=explode.task_name).update(
+            status=Task.FAILED)
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get('/admin/core/task/')
+        self.assertContains(
+            response, 'Задачи: в очереди 1, выполняется 0, с ошибкой 1')
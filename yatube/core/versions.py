@@ -0,0 +1,23 @@
+"""Счётчики версий для сброса целых групп ключей кэша.
+
+Ключ с версией в имени не нужно удалять: после ``bump_version`` его
+просто перестают читать, а старые записи вытесняются по сроку.
+"""
+from django.core.cache import cache
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    return cache.get(_key(name), 0)
+
+
+def bump_version(name):
+    key = _key(name)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
@@ -1,4 +1,20 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+# Файлы оболочки приложения, которые service worker кэширует при установке.
+SHELL_ASSETS = (
+    'css/bootstrap.min.css',
+    'img/logo.png',
+    'img/fav/favicon-32x32.png',
+    'js/app.js',
+)
 
 
 def page_not_found(request, exception):
@@ -16,3 +32,60 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def app_shell(request):
+    """Шапка и подвал сайта без содержимого: его подгружает app.js."""
+    return render(request, 'core/shell.html')
+
+
+def service_worker(request):
+    """Скрипт service worker.
+
+    Версия кэша зависит от адресов статики: после ``collectstatic``
+    с изменёнными файлами они получают новый хэш, и оболочка
+    кэшируется заново.
+    """
+    assets = [reverse('app_shell')] + [static(name) for name in SHELL_ASSETS]
+    config = {
+        'version': hashlib.md5('|'.join(assets).encode()).hexdigest()[:12],
+        'shell': reverse('app_shell'),
+        'assets': assets,
+        'shellRoutes': settings.PWA_SHELL_ROUTES,
+        'postRoute': settings.PWA_POST_ROUTE,
+        'postLimit': settings.PWA_POST_CACHE_LIMIT,
+    }
+    response = render(
+        request, 'core/sw.js', {'config': json.dumps(config)},
+        content_type='application/javascript')
+    # Браузер и так проверяет скрипт не реже раза в сутки, но без
+    # no-cache новая версия может дойти до пользователей позже.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def manifest(request):
+    response = JsonResponse({
+        'name': 'Yatube',
+        'short_name': 'Yatube',
+        'lang': 'ru',
+        'start_url': reverse('posts:index'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#ffffff',
+        'theme_color': '#ffffff',
+        'icons': [
+            {
+                'src': static('img/fav/favicon-32x32.png'),
+                'sizes': '32x32',
+                'type': 'image/png',
+            },
+            {
+                'src': static('img/fav/apple-touch-icon.png'),
+                'sizes': '180x180',
+                'type': 'image/png',
+            },
+        ],
+    }, content_type='application/manifest+json')
+    patch_cache_control(response, public=True, max_age=60 * 60)
+    return response
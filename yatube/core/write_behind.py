@@ -0,0 +1,186 @@
+"""Отложенная запись: действия копятся в локальной очереди на диске
+и применяются к основной БД пачками одним писателем.
+
+Пока действие не применено, автор видит его через ``pending``: это
+строки той же очереди, которые писатель ещё не удалил.
+"""
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import traceback
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def handler(action):
+    """Регистрирует функцию, применяющую пачку действий ``action``."""
+    def decorator(func):
+        _handlers[action] = func
+        return func
+    return decorator
+
+
+class WriteQueue:
+    """Очередь действий в отдельном файле SQLite.
+
+    Запись в неё не ждёт блокировку основной БД, а ``synchronous=FULL``
+    сохраняет принятые действия при падении процесса. Действия, которые
+    не удалось применить за ``WRITE_BEHIND_MAX_ATTEMPTS`` попыток,
+    переносятся в таблицу ``failed``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS queue ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'action TEXT NOT NULL, payload TEXT NOT NULL, '
+                'user_id INTEGER, attempts INTEGER NOT NULL DEFAULT 0)')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS queue_user ON queue (user_id)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS failed ('
+                'id INTEGER PRIMARY KEY, action TEXT NOT NULL, '
+                'payload TEXT NOT NULL, user_id INTEGER, error TEXT)')
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
+
+    def push(self, action, payload, user_id=None):
+        cursor = self._db.execute(
+            'INSERT INTO queue (action, payload, user_id) VALUES (?, ?, ?)',
+            (action, json.dumps(payload), user_id))
+        return cursor.lastrowid
+
+    def pending(self, user_id):
+        rows = self._db.execute(
+            'SELECT id, action, payload FROM queue WHERE user_id = ? '
+            'ORDER BY id', (user_id,))
+        return [(pk, action, json.loads(payload))
+                for pk, action, payload in rows]
+
+    def retrying(self):
+        """Была ли неудачная попытка применить первое действие."""
+        row = self._db.execute(
+            'SELECT attempts FROM queue ORDER BY id LIMIT 1').fetchone()
+        return bool(row and row[0])
+
+    def batch(self, limit):
+        rows = self._db.execute(
+            'SELECT id, action, payload FROM queue ORDER BY id LIMIT ?',
+            (limit,))
+        return [(pk, action, json.loads(payload))
+                for pk, action, payload in rows]
+
+    def ack(self, last_id):
+        self._db.execute('DELETE FROM queue WHERE id <= ?', (last_id,))
+
+    def fail(self, last_id, max_attempts, error):
+        """Засчитывает попытку и убирает действия, исчерпавшие попытки."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'UPDATE queue SET attempts = attempts + 1 WHERE id <= ?',
+                (last_id,))
+            db.execute(
+                'INSERT OR REPLACE INTO failed '
+                '(id, action, payload, user_id, error) '
+                'SELECT id, action, payload, user_id, ? FROM queue '
+                'WHERE id <= ? AND attempts >= ?',
+                (error, last_id, max_attempts))
+            db.execute(
+                'DELETE FROM queue WHERE id <= ? AND attempts >= ?',
+                (last_id, max_attempts))
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def failed(self):
+        rows = self._db.execute(
+            'SELECT id, action, payload FROM failed ORDER BY id')
+        return [(pk, action, json.loads(payload))
+                for pk, action, payload in rows]
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+
+def get_queue():
+    path = settings.WRITE_BEHIND_PATH
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = WriteQueue(path)
+        return _queues[path]
+
+
+def enqueue(action, payload, user_id):
+    """Ставит действие пользователя в очередь."""
+    return get_queue().push(action, payload, user_id)
+
+
+def pending(user_id, action=None):
+    """Ещё не применённые действия пользователя в порядке постановки."""
+    if user_id is None:
+        return []
+    return [
+        (pk, entry_action, payload)
+        for pk, entry_action, payload in get_queue().pending(user_id)
+        if action in (None, entry_action)
+    ]
+
+
+def apply_batch(limit=500):
+    """Применяет до ``limit`` действий в одной транзакции.
+
+    Файловая блокировка не даёт двум писателям работать одновременно.
+    После неудачной пачки действия применяются по одному, чтобы
+    отложить только то, которое не применяется. Действие может быть
+    применено повторно, если процесс упал между коммитом и удалением
+    из очереди, поэтому обработчики должны это выдерживать.
+    Возвращает число применённых действий.
+    """
+    queue = get_queue()
+    with open(queue.path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if queue.retrying():
+            limit = 1
+        entries = queue.batch(limit)
+        if not entries:
+            return 0
+        last_id = entries[-1][0]
+        try:
+            with transaction.atomic():
+                for action, group in groupby(entries, key=lambda e: e[1]):
+                    _handlers[action]([payload for _, _, payload in group])
+        except Exception:
+            logger.exception('Не удалось применить отложенные действия')
+            queue.fail(
+                last_id, settings.WRITE_BEHIND_MAX_ATTEMPTS,
+                traceback.format_exc())
+            return 0
+        queue.ack(last_id)
+        return len(entries)
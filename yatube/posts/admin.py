@@ -1,6 +1,47 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
 
-from .models import Group, Post, Comment, Follow
+from .deletion import schedule_deletion
+from .models import Group, Post, Comment, Follow, Deletion, User
+
+
+def delete_in_background(modeladmin, request, queryset):
+    for obj in queryset:
+        schedule_deletion(obj)
+    modeladmin.message_user(
+        request,
+        f'Поставлено в очередь на удаление: {len(queryset)}. '
+        'Объекты скрыты с сайта, ход удаления виден в разделе «Удаления».')
+
+
+delete_in_background.short_description = 'Удалить в фоне'
+
+
+class BackgroundDeleteMixin:
+    """Удаление из админки только ставится в очередь.
+
+    Действие ``delete_selected`` убрано, а страница удаления объекта
+    вызывает ``schedule_deletion`` вместо синхронного каскада.
+    """
+
+    actions = (delete_in_background,)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        # Связанные строки соберёт фоновое удаление: страница
+        # подтверждения не должна обходить их все.
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            schedule_deletion(obj)
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -17,7 +58,7 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class GroupAdmin(admin.ModelAdmin):
+class GroupAdmin(BackgroundDeleteMixin, admin.ModelAdmin):
     list_display = (
         'title',
         'slug',
@@ -40,6 +81,37 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
 
 
+class DeletionAdmin(admin.ModelAdmin):
+    list_display = (
+        'name',
+        'kind',
+        'progress',
+        'done',
+        'total',
+        'created',
+        'finished',
+    )
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'object_id', 'name', 'total', 'done',
+                       'finished')
+    empty_value_display = '-пусто-'
+
+    def progress(self, obj):
+        return f'{obj.progress}%'
+
+    progress.short_description = 'Готово'
+
+    def has_add_permission(self, request):
+        return False
+
+
+class BackgroundDeleteUserAdmin(BackgroundDeleteMixin, UserAdmin):
+    pass
+
+
+admin.site.unregister(User)
+admin.site.register(User, BackgroundDeleteUserAdmin)
+admin.site.register(Deletion, DeletionAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,94 @@
+"""Архив постов по месяцам и счётчики постов за месяц."""
+from collections import Counter
+from datetime import date, datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import MonthlyCount
+
+
+def month_range(year, month):
+    """Границы месяца для запроса по индексу ``pub_date``."""
+    start = timezone.make_aware(datetime(year, month, 1))
+    if month == 12:
+        end = timezone.make_aware(datetime(year + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime(year, month + 1, 1))
+    return start, end
+
+
+def group_key(post, group_id):
+    pub_date = timezone.localtime(post.pub_date)
+    return (MonthlyCount.GROUP, group_id, pub_date.year, pub_date.month)
+
+
+def post_keys(post):
+    """Ключи счётчиков, в которые входит пост."""
+    pub_date = timezone.localtime(post.pub_date)
+    keys = [
+        (MonthlyCount.ALL, 0, pub_date.year, pub_date.month),
+        (MonthlyCount.AUTHOR, post.author_id, pub_date.year, pub_date.month),
+    ]
+    if post.group_id:
+        keys.append(group_key(post, post.group_id))
+    return keys
+
+
+def month_counts(posts):
+    """Счётчики для выборки постов: {(kind, object_id, year, month): n}."""
+    rows = posts.order_by().annotate(
+        year=ExtractYear('pub_date'),
+        month=ExtractMonth('pub_date'),
+    ).values('year', 'month', 'author_id', 'group_id').annotate(
+        number=Count('pk'))
+    counts = Counter()
+    for row in rows:
+        month = (row['year'], row['month'])
+        counts[(MonthlyCount.ALL, 0, *month)] += row['number']
+        counts[(MonthlyCount.AUTHOR, row['author_id'], *month)] += (
+            row['number'])
+        if row['group_id']:
+            counts[(MonthlyCount.GROUP, row['group_id'], *month)] += (
+                row['number'])
+    return counts
+
+
+def change(counts):
+    """Прибавляет к счётчикам ``{ключ: изменение}``."""
+    for (kind, object_id, year, month), delta in counts.items():
+        key = dict(kind=kind, object_id=object_id, year=year, month=month)
+        if MonthlyCount.objects.filter(**key).update(
+                number=F('number') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                MonthlyCount.objects.create(number=delta, **key)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос.
+            MonthlyCount.objects.filter(**key).update(
+                number=F('number') + delta)
+
+
+def rebuild(posts):
+    """Пересчитывает все счётчики по выборке ``posts``."""
+    with transaction.atomic():
+        MonthlyCount.objects.all().delete()
+        MonthlyCount.objects.bulk_create(
+            MonthlyCount(
+                kind=kind, object_id=object_id, year=year, month=month,
+                number=number)
+            for (kind, object_id, year, month), number
+            in month_counts(posts).items())
+
+
+def months(kind, object_id=0):
+    """Месяцы с постами, от новых к старым: (дата, число постов)."""
+    return [
+        (date(year, month, 1), number)
+        for year, month, number in MonthlyCount.objects.filter(
+            kind=kind, object_id=object_id, number__gt=0).order_by(
+                '-year', '-month').values_list('year', 'month', 'number')
+    ]
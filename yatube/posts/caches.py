@@ -0,0 +1,9 @@
+from core.object_cache import ObjectCache
+
+from .models import Group, Post, User
+
+post_cache = ObjectCache(Post)
+group_cache = ObjectCache(Group, natural_key='slug')
+user_cache = ObjectCache(
+    User, natural_key='username',
+    fields=('username', 'first_name', 'last_name'))
@@ -0,0 +1,117 @@
+"""Удаление пользователей и групп небольшими частями в фоне.
+
+Объект сразу скрывается с сайта, а связанные строки удаляются
+(или отвязываются от группы) порциями по ``CHUNK`` в отдельных
+транзакциях, так что запись в SQLite не блокируется надолго.
+"""
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.paginator import bump_count_version
+from core.tasks import task
+
+from . import archive, likes
+from .caches import post_cache
+from .group_index import invalidate_group_index
+from .new_posts import posts_changed
+from .models import (
+    Comment, Deletion, Follow, Group, Like, LikeCounter, MonthlyCount,
+    Notification, Post, PostViews, User
+)
+
+CHUNK = 500
+CHUNKS_PER_RUN = 20
+
+
+def _steps(deletion):
+    """Шаги удаления: (действие, выборка) в порядке выполнения."""
+    pk = deletion.object_id
+    if deletion.kind == Deletion.GROUP:
+        return [('unset_group', Post.objects.filter(group_id=pk))]
+    return [
+        ('delete', Notification.objects.filter(
+            Q(recipient_id=pk) | Q(actor_id=pk) | Q(post__author_id=pk))),
+        ('delete', Comment.objects.filter(
+            Q(author_id=pk) | Q(post__author_id=pk))),
+        ('delete', Follow.objects.filter(Q(user_id=pk) | Q(author_id=pk))),
+        ('delete', PostViews.objects.filter(post__author_id=pk)),
+        ('delete', Like.objects.filter(
+            Q(user_id=pk) | Q(post__author_id=pk))),
+        ('delete', LikeCounter.objects.filter(post__author_id=pk)),
+        ('delete_posts', Post.objects.filter(author_id=pk)),
+    ]
+
+
+def schedule_deletion(obj):
+    """Скрывает пользователя или группу и ставит удаление в очередь."""
+    kind = Deletion.USER if isinstance(obj, User) else Deletion.GROUP
+    deletion = Deletion(kind=kind, object_id=obj.pk, name=str(obj))
+    deletion.total = sum(
+        queryset.count() for _, queryset in _steps(deletion))
+    deletion, _ = Deletion.objects.get_or_create(
+        kind=kind, object_id=obj.pk,
+        defaults={'name': deletion.name, 'total': deletion.total})
+    if kind == Deletion.USER:
+        User.objects.filter(pk=obj.pk).update(is_active=False)
+    else:
+        invalidate_group_index()
+    bump_count_version(Post)
+    posts_changed()
+    delete_in_chunks.delay(deletion.pk)
+    return deletion
+
+
+def _process_chunk(action, queryset):
+    pks = list(queryset.order_by().values_list('pk', flat=True)[:CHUNK])
+    if not pks:
+        return 0
+    chunk = queryset.model.objects.filter(pk__in=pks)
+    if queryset.model is Post:
+        counts = archive.month_counts(chunk)
+        archive.change({
+            key: -number for key, number in counts.items()
+            if action == 'delete_posts' or key[0] == MonthlyCount.GROUP
+        })
+    if queryset.model is Like:
+        liked_posts = set(chunk.values_list('post_id', flat=True))
+    if action == 'unset_group':
+        chunk.update(group=None)
+    else:
+        # Зависимые строки удалены на прошлых шагах, а сигналы по каждой
+        # строке не нужны: кэши сбрасываются один раз на порцию.
+        chunk._raw_delete(chunk.db)
+    if queryset.model is Like:
+        likes.recount(liked_posts)
+    if queryset.model is Post:
+        post_cache.forget(pks)
+    return len(pks)
+
+
+def _finish(deletion):
+    model = User if deletion.kind == Deletion.USER else Group
+    model.objects.filter(pk=deletion.object_id).delete()
+    Deletion.objects.filter(pk=deletion.pk).update(finished=timezone.now())
+    bump_count_version(Post, deleted=True)
+
+
+@task(unique=True)
+def delete_in_chunks(deletion_id):
+    """Обрабатывает до ``CHUNKS_PER_RUN`` порций и ставит себя снова,
+    чтобы одно удаление не занимало обработчик надолго.
+    """
+    deletion = Deletion.objects.filter(
+        pk=deletion_id, finished__isnull=True).first()
+    if deletion is None:
+        return
+    for _ in range(CHUNKS_PER_RUN):
+        for action, queryset in _steps(deletion):
+            processed = _process_chunk(action, queryset)
+            if processed:
+                break
+        else:
+            _finish(deletion)
+            return
+        Deletion.objects.filter(pk=deletion.pk).update(
+            done=F('done') + processed)
+    bump_count_version(Post, deleted=True)
+    delete_in_chunks.delay(deletion_id)
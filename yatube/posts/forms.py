@@ -1,9 +1,22 @@
 from django import forms
+from django.conf import settings
 
+from .group_index import group_choices, group_index
 from .models import Post, Comment
+from .widgets import GroupAutocompleteWidget
 
 
 class PostForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        group = self.fields['group']
+        if len(group_index()) > settings.GROUP_AUTOCOMPLETE_THRESHOLD:
+            group.widget = GroupAutocompleteWidget()
+        else:
+            # Варианты из кэша вместо запроса всех групп при рендере.
+            group.choices = lambda: (
+                [('', group.empty_label)] + group_choices())
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
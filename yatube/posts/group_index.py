@@ -0,0 +1,49 @@
+"""Закэшированный список групп для формы поста и автодополнения.
+
+Список хранится отсортированным по названию без учёта регистра, поэтому
+поиск по префиксу — это бинарный поиск, а не перебор всех групп.
+"""
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from core.versions import bump_version, get_version
+
+from .hidden import hidden
+from .models import Deletion, Group
+
+VERSION_NAME = 'group_index'
+TIMEOUT = 60 * 60 * 24
+
+
+def group_index():
+    """Кортежи (ключ поиска, pk, название), отсортированные по ключу."""
+    key = f'group_index:{get_version(VERSION_NAME)}'
+    index = cache.get(key)
+    if index is None:
+        index = sorted(
+            (title.casefold(), pk, title)
+            for pk, title in Group.objects.exclude(
+                pk__in=hidden(Deletion.GROUP)).values_list('pk', 'title'))
+        cache.set(key, index, TIMEOUT)
+    return index
+
+
+def invalidate_group_index():
+    bump_version(VERSION_NAME)
+
+
+def group_choices():
+    return [(pk, title) for _, pk, title in group_index()]
+
+
+def search_groups(prefix, limit=20):
+    """Группы, название которых начинается с ``prefix``."""
+    prefix = prefix.casefold()
+    index = group_index()
+    found = []
+    for search_key, pk, title in index[bisect_left(index, (prefix,)):]:
+        if not search_key.startswith(prefix) or len(found) == limit:
+            break
+        found.append((pk, title))
+    return found
@@ -0,0 +1,34 @@
+"""Пользователи и группы, скрытые до окончания фонового удаления.
+
+Проверки — это подзапросы внутри основных запросов страниц, поэтому
+скрытие не добавляет обращений к БД.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import Deletion, Post
+
+
+def hidden(kind):
+    """Подзапрос с идентификаторами объектов, которые сейчас удаляются."""
+    return Deletion.objects.filter(
+        kind=kind, finished__isnull=True).values('object_id')
+
+
+def is_hidden(kind, pk_field='pk'):
+    """Аннотация: удаляется ли объект из поля ``pk_field``."""
+    return Exists(hidden(kind).filter(object_id=OuterRef(pk_field)))
+
+
+def visible(posts):
+    """Посты без авторов, которые сейчас удаляются."""
+    return posts.exclude(author_id__in=hidden(Deletion.USER))
+
+
+def author_hidden(post):
+    """Удаляется ли автор поста; отдельный запрос для пишущих view."""
+    return hidden(Deletion.USER).filter(object_id=post.author_id).exists()
+
+
+def hidden_posts():
+    """Посты, которые ``visible`` убирает из ленты."""
+    return Post.objects.filter(author_id__in=hidden(Deletion.USER))
@@ -0,0 +1,92 @@
+"""Лайки постов и их счётчики.
+
+У поста одна строка счётчика. SQLite пропускает только одну пишущую
+транзакцию на всю базу, поэтому деление счётчика на строки ничего бы
+не дало. Для ленты числа берутся одним запросом на страницу и
+подставляются в дырки ``likes`` закэшированных карточек.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.template.loader import render_to_string
+
+from core.swr import hole
+
+from .models import Like, LikeCounter
+
+
+def likes_number():
+    """Аннотация с числом лайков одного поста."""
+    return Subquery(
+        LikeCounter.objects.filter(post=OuterRef('pk')).values('number'))
+
+
+def likes_numbers(posts):
+    """Числа лайков постов из выборки ``posts`` одним запросом."""
+    return dict(LikeCounter.objects.filter(
+        post__in=posts.values('pk'), number__gt=0).values_list(
+            'post', 'number'))
+
+
+def _change(post_id, delta):
+    counter = LikeCounter.objects.filter(post_id=post_id)
+    if counter.update(number=F('number') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LikeCounter.objects.create(post_id=post_id, number=delta)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос.
+        counter.update(number=F('number') + delta)
+
+
+def like(user, post):
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Like.objects.create(user=user, post=post)
+        except IntegrityError:
+            return False
+        _change(post.pk, 1)
+    return True
+
+
+def unlike(user, post):
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            _change(post.pk, -1)
+    return bool(deleted)
+
+
+def liked_posts(user, posts):
+    """Какие посты из выборки ``posts`` лайкнул пользователь.
+
+    Один запрос на всю страницу: выборка становится подзапросом.
+    """
+    if not user.is_authenticated:
+        return set()
+    return set(Like.objects.filter(
+        user=user, post__in=posts.values('pk')).values_list(
+            'post_id', flat=True))
+
+
+def recount(post_ids):
+    """Пересчитывает по таблице лайков счётчики постов ``post_ids``:
+    у каждого поста остаётся одна строка с числом его лайков."""
+    with transaction.atomic():
+        LikeCounter.objects.filter(post_id__in=post_ids).delete()
+        LikeCounter.objects.bulk_create(
+            LikeCounter(post_id=row['post'], number=row['number'])
+            for row in Like.objects.filter(post_id__in=post_ids).values(
+                'post').annotate(number=Count('pk')))
+
+
+@hole('likes')
+def like_buttons(context, post_id):
+    """Кнопка лайка с числом лайков для карточки из общего кэша."""
+    post_id = int(post_id)
+    return render_to_string('posts/includes/like_buttons.html', {
+        'post_id': post_id,
+        'number': context.get('likes', {}).get(post_id, 0),
+        'liked': post_id in context.get('liked', ()),
+    })
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import rebuild
+from posts.models import MonthlyCount, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики архива по месяцам, например после '
+            'массовой загрузки постов в обход сигналов.')
+
+    def handle(self, *args, **options):
+        rebuild(Post.objects.all())
+        self.stdout.write(
+            f'Счётчиков архива: {MonthlyCount.objects.count()}')
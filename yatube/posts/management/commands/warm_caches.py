@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.warmup import feed_urls, warm
+
+
+class Command(BaseCommand):
+    help = ('Рендерит первые страницы общей ленты, популярных групп '
+            'и авторов, заполняя кэши фрагментов и миниатюры.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--authors', type=int, default=10)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        urls = feed_urls(
+            options['pages'], options['groups'], options['authors'])
+        statuses = warm(urls, options['workers'])
+        failed = [url for url, status in statuses.items() if status != 200]
+        for url in failed:
+            self.stderr.write(f'{url}: {statuses[url]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето страниц: {len(urls) - len(failed)} из {len(urls)}'))
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('group', 'Группа')], max_length=10, verbose_name='Что удаляется')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего строк')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'Удаление',
+                'verbose_name_plural': 'Удаления',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='deletion',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_deletion'),
+        ),
+    ]
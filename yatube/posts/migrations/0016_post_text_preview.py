@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+BATCH = 1000
+
+# Копия posts.previews на момент миграции: её результат не должен
+# зависеть от того, как превью строятся в более поздних версиях.
+PREVIEW_LENGTH = 300
+
+ELLIPSIS = '…'
+
+
+def make_preview(text, length):
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    if not text[length].isspace():
+        head = cut.rsplit(None, 1)[0]
+        if len(head) > length // 2:
+            cut = head
+    return cut.rstrip(' \t\n,.;:—-') + ELLIPSIS
+
+
+def fill_previews(apps, schema_editor):
+    # Посты читаются и обновляются пачками по первичному ключу, чтобы
+    # не держать в памяти тексты всей таблицы.
+    Post = apps.get_model('posts', 'Post')
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                'pk', 'text')[:BATCH])
+        if not posts:
+            break
+        for post in posts:
+            post.text_preview = make_preview(post.text, PREVIEW_LENGTH)
+        Post.objects.bulk_update(posts, ['text_preview'])
+        last_pk = posts[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='text_preview',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью текста'),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:27
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_counts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MonthlyCount = apps.get_model('posts', 'MonthlyCount')
+    rows = Post.objects.order_by().annotate(
+        year=ExtractYear('pub_date'),
+        month=ExtractMonth('pub_date'),
+    ).values('year', 'month', 'author_id', 'group_id').annotate(
+        number=Count('pk'))
+    counts = Counter()
+    for row in rows:
+        month = (row['year'], row['month'])
+        counts[('all', 0, *month)] += row['number']
+        counts[('author', row['author_id'], *month)] += row['number']
+        if row['group_id']:
+            counts[('group', row['group_id'], *month)] += row['number']
+    MonthlyCount.objects.bulk_create(
+        MonthlyCount(
+            kind=kind, object_id=object_id, year=year, month=month,
+            number=number)
+        for (kind, object_id, year, month), number in counts.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_text_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('all', 'Все посты'), ('group', 'Группа'), ('author', 'Автор')], max_length=10, verbose_name='Лента')),
+                ('object_id', models.PositiveIntegerField(default=0, verbose_name='Идентификатор')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Месяц')),
+                ('number', models.IntegerField(default=0, verbose_name='Постов')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlycount',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'year', 'month'), name='unique_monthly_count'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_monthlycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViews',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='view_stats', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотров')),
+                ('unique_viewers', models.PositiveIntegerField(default=0, verbose_name='Уникальных читателей')),
+                ('viewers_sketch', models.BinaryField(default=b'', verbose_name='Скетч читателей')),
+            ],
+        ),
+    ]
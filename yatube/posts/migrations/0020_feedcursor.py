@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0019_like'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCursor',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_cursor', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('seen_at', models.DateTimeField(verbose_name='Просмотрено')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_pub_date'),
+        ),
+    ]
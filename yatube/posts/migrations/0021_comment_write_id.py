@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_feedcursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='write_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
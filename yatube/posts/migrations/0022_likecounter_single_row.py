@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:40
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def merge_shards(apps, schema_editor):
+    LikeCounter = apps.get_model('posts', 'LikeCounter')
+    totals = list(LikeCounter.objects.order_by().values('post').annotate(
+        total=Sum('number')).values_list('post', 'total'))
+    LikeCounter.objects.all().delete()
+    LikeCounter.objects.bulk_create(
+        LikeCounter(post_id=post, shard=0, number=total)
+        for post, total in totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_comment_write_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_shards, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='likecounter',
+            name='unique_like_counter',
+        ),
+        migrations.RemoveField(
+            model_name='likecounter',
+            name='shard',
+        ),
+        migrations.AlterField(
+            model_name='likecounter',
+            name='post',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='like_counter', to='posts.Post', verbose_name='Пост'),
+        ),
+    ]
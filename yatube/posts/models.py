@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, Max
+
+from core.models import CreatedModel
+
+from .previews import ELLIPSIS, make_preview
 
 User = get_user_model()
 
@@ -13,11 +19,46 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """Посты, к которым данные для карточек догружаются пачкой.
+
+    Загрузчики вызываются один раз на всю выборку после её получения,
+    поэтому страница ленты не делает отдельных запросов на карточку.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._card_loaders = []
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._card_loaders = self._card_loaders[:]
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if not fetched and self._result_cache:
+            for loader in self._card_loaders:
+                loader(self._result_cache)
+
+    def with_comment_stats(self):
+        """Число комментариев и дата последнего у каждого поста."""
+        clone = self._chain()
+        clone._card_loaders.append(load_comment_stats)
+        return clone
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
+    text_preview = models.TextField(
+        'Превью текста',
+        blank=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
@@ -45,12 +86,50 @@ class Post(models.Model):
         help_text='Добавьте картинку к публикации'
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            # Подсчёт новых постов избранных авторов с момента визита.
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.text_preview = make_preview(
+            self.text, settings.POST_PREVIEW_LENGTH)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_preview'}
+        super().save(*args, **kwargs)
+
+    @property
+    def preview_truncated(self):
+        """Показывает ли превью не весь текст."""
+        return self.text_preview.endswith(ELLIPSIS)
+
+
+class PostViews(models.Model):
+    """Просмотры поста и скетч HyperLogLog его уникальных читателей.
+
+    Пишется пачками из буфера ``posts.view_counts``.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='view_stats',
+        verbose_name='Пост'
+    )
+    views = models.PositiveIntegerField('Просмотров', default=0)
+    unique_viewers = models.PositiveIntegerField(
+        'Уникальных читателей', default=0)
+    viewers_sketch = models.BinaryField('Скетч читателей', default=b'')
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -73,6 +152,28 @@ class Comment(models.Model):
     created = models.DateTimeField(
         auto_now_add=True
     )
+    # Идентификатор из очереди отложенной записи: повторное применение
+    # того же действия не создаст второй комментарий.
+    write_id = models.UUIDField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False
+    )
+
+
+def load_comment_stats(posts):
+    stats = {
+        row['post']: row
+        for row in Comment.objects.filter(post__in=posts).values(
+            'post').annotate(
+                comments_number=Count('pk'),
+                last_commented=Max('created'))
+    }
+    for post in posts:
+        row = stats.get(post.pk, {})
+        post.comments_number = row.get('comments_number', 0)
+        post.last_commented = row.get('last_commented')
 
 
 class Follow(models.Model):
@@ -93,3 +194,158 @@ class Follow(models.Model):
                 fields=['user', 'author', ],
                 name='unique_follow'),
         ]
+
+
+class Like(CreatedModel):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пользователь'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_like'),
+        ]
+
+
+class LikeCounter(models.Model):
+    """Счётчик лайков поста."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counter',
+        verbose_name='Пост'
+    )
+    number = models.IntegerField('Лайков', default=0)
+
+
+class FeedCursor(models.Model):
+    """Когда пользователь последний раз смотрел ленту подписок."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='feed_cursor',
+        verbose_name='Пользователь'
+    )
+    seen_at = models.DateTimeField('Просмотрено')
+
+
+class Notification(CreatedModel):
+    """Событие для автора: комментарий к его посту или новый подписчик."""
+    COMMENT = 'comment'
+    FOLLOW = 'follow'
+    KINDS = (
+        (COMMENT, 'Комментарий'),
+        (FOLLOW, 'Подписка'),
+    )
+
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Кто'
+    )
+    kind = models.CharField('Событие', max_length=10, choices=KINDS)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Пост'
+    )
+    read = models.BooleanField('Прочитано', default=False)
+    emailed = models.BooleanField('Отправлено письмом', default=False)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['recipient', 'read']),
+            models.Index(fields=['emailed']),
+        ]
+
+
+class Deletion(CreatedModel):
+    """Фоновое удаление пользователя или группы по частям.
+
+    Пока удаление не закончено, объект скрыт с сайта.
+    """
+    USER = 'user'
+    GROUP = 'group'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField('Что удаляется', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор')
+    name = models.CharField('Название', max_length=200)
+    total = models.PositiveIntegerField('Всего строк', default=0)
+    done = models.PositiveIntegerField('Обработано строк', default=0)
+    finished = models.DateTimeField('Завершено', blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Удаление'
+        verbose_name_plural = 'Удаления'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique_deletion'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.name}'
+
+    @property
+    def progress(self):
+        if self.finished:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, self.done * 100 // self.total)
+
+
+class MonthlyCount(models.Model):
+    """Число постов за месяц во всей ленте, в группе или у автора.
+
+    Поддерживается сигналами при записи постов, чтобы навигация
+    по архиву не считала посты GROUP BY по всей таблице.
+    """
+    ALL = 'all'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    KINDS = (
+        (ALL, 'Все посты'),
+        (GROUP, 'Группа'),
+        (AUTHOR, 'Автор'),
+    )
+
+    kind = models.CharField('Лента', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор', default=0)
+    year = models.PositiveSmallIntegerField('Год')
+    month = models.PositiveSmallIntegerField('Месяц')
+    number = models.IntegerField('Постов', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'year', 'month'],
+                name='unique_monthly_count'),
+        ]
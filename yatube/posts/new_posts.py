@@ -0,0 +1,89 @@
+"""Новые посты в ленте подписок с последнего визита.
+
+Опрос раз в полминуты должен стоить дёшево: ETag ответа собирается
+из отметок времени в кэше, и пока ни они, ни курсор не менялись,
+клиент получает 304 без запросов к таблице постов.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .hidden import visible
+from .models import FeedCursor, Post
+
+# Больше этого числа новых постов не считаем и показываем «99+».
+CAP = 99
+
+CHANGED_KEY = 'new_posts:posts_changed'
+
+
+def _seen_key(user_id):
+    return f'new_posts:seen:{user_id}'
+
+
+def _follows_key(user_id):
+    return f'new_posts:follows:{user_id}'
+
+
+def _now():
+    return timezone.now().isoformat()
+
+
+def posts_changed():
+    """Отмечает, что посты добавились или удалились."""
+    cache.set(CHANGED_KEY, _now(), None)
+
+
+def follows_changed(user_id):
+    cache.set(_follows_key(user_id), _now(), None)
+
+
+def mark_seen(user, seen_at):
+    """Сдвигает курсор пользователя: всё до ``seen_at`` прочитано.
+
+    Повторный просмотр тех же постов курсор не меняет и в базу не пишет.
+    """
+    current = last_seen(user.pk)
+    if current is not None and seen_at <= current:
+        return
+    FeedCursor.objects.bulk_create(
+        [FeedCursor(user=user, seen_at=seen_at)], ignore_conflicts=True)
+    FeedCursor.objects.filter(user=user).update(seen_at=seen_at)
+    cache.set(_seen_key(user.pk), seen_at, None)
+
+
+def last_seen(user_id):
+    seen_at = cache.get(_seen_key(user_id))
+    if seen_at is None:
+        seen_at = FeedCursor.objects.filter(user_id=user_id).values_list(
+            'seen_at', flat=True).first() or False
+        cache.set(_seen_key(user_id), seen_at, None)
+    return seen_at or None
+
+
+def etag(user_id):
+    """Меняется, когда может измениться число новых постов."""
+    keys = [CHANGED_KEY, _follows_key(user_id)]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            # После очистки кэша начинаем отсчёт заново.
+            stamps[key] = _now()
+            cache.set(key, stamps[key], None)
+    parts = [stamps[key] for key in keys] + [str(last_seen(user_id))]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def new_posts_count(user):
+    """Число новых постов избранных авторов, но не больше ``CAP + 1``."""
+    posts = visible(Post.objects.filter(author__following__user=user))
+    seen_at = last_seen(user.pk)
+    if seen_at is not None:
+        posts = posts.filter(pub_date__gt=seen_at)
+    # COUNT по подзапросу с LIMIT: работа не растёт с числом постов.
+    return posts.order_by()[:CAP + 1].count()
+
+
+def label(count):
+    return f'{CAP}+' if count > CAP else str(count)
@@ -0,0 +1,87 @@
+"""Уведомления авторов о комментариях и подписчиках.
+
+События пишутся одной вставкой, счётчик непрочитанных живёт в кэше,
+а письма уходят периодическими сводками по одной на получателя.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from core.tasks import task
+
+from .models import Notification
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def notify(notifications):
+    """Сохраняет события и увеличивает счётчики получателей."""
+    notifications = [
+        notification for notification in notifications
+        if notification.recipient_id != notification.actor_id
+    ]
+    Notification.objects.bulk_create(notifications)
+    for notification in notifications:
+        try:
+            cache.incr(_unread_key(notification.recipient_id))
+        except ValueError:
+            # Счётчика нет в кэше: он будет пересчитан при чтении.
+            pass
+
+
+def unread_count(user):
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient=user, read=False).count()
+        cache.set(key, count, None)
+    return count
+
+
+def mark_read(user):
+    Notification.objects.filter(recipient=user, read=False).update(read=True)
+    cache.set(_unread_key(user.pk), 0, None)
+
+
+def send_digest_batch(limit, connection):
+    """Отправляет сводки по ``limit`` событиям через открытое соединение.
+
+    Возвращает число обработанных событий.
+    """
+    notifications = list(
+        Notification.objects.filter(emailed=False).select_related(
+            'recipient', 'actor', 'post').defer('post__text').order_by(
+                'recipient', 'created')[:limit])
+    messages = []
+    for recipient, events in groupby(
+            notifications, key=lambda event: event.recipient):
+        if not recipient.email:
+            continue
+        messages.append(EmailMessage(
+            subject='Новые события на Yatube',
+            body=render_to_string('posts/email/digest.txt', {
+                'recipient': recipient,
+                'events': list(events),
+            }),
+            to=[recipient.email],
+        ))
+    if messages:
+        connection.send_messages(messages)
+    Notification.objects.filter(
+        pk__in=[event.pk for event in notifications]).update(emailed=True)
+    return len(notifications)
+
+
+@task(every=timedelta(seconds=settings.NOTIFICATION_DIGEST_INTERVAL))
+def send_digests():
+    """Рассылает накопившиеся события, не переподключаясь к серверу."""
+    batch = settings.NOTIFICATION_DIGEST_BATCH
+    with get_connection() as connection:
+        while send_digest_batch(batch, connection) == batch:
+            pass
@@ -0,0 +1,16 @@
+"""Короткие превью текстов постов для лент."""
+ELLIPSIS = '…'
+
+
+def make_preview(text, length):
+    """Начало ``text`` не длиннее ``length`` символов по границе слова."""
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    # Слово, разрезанное на границе, отбрасываем целиком, если оно
+    # не занимает больше половины превью.
+    if not text[length].isspace():
+        head = cut.rsplit(None, 1)[0]
+        if len(head) > length // 2:
+            cut = head
+    return cut.rstrip(' \t\n,.;:—-') + ELLIPSIS
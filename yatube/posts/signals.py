@@ -0,0 +1,123 @@
+from collections import Counter
+
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from core.paginator import bump_count_version
+
+from . import archive, new_posts
+from .caches import post_cache
+from .group_index import invalidate_group_index
+from .models import (
+    Comment, Follow, Group, MonthlyCount, Notification, Post
+)
+from .notifications import notify, unread_count
+from .tasks import make_thumbnails, rerender_first_pages
+from .warmup import first_page_keys
+
+
+@receiver(post_save, sender=Post)
+def refresh_feeds(sender, instance, **kwargs):
+    """Новый или изменённый пост сразу виден на первых страницах лент."""
+    cache.delete_many(first_page_keys(instance))
+    rerender_first_pages.delay(instance.pk)
+    if instance.image:
+        make_thumbnails.delay(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_post_counts(sender, signal, **kwargs):
+    """Количество постов в лентах пересчитывается после записи."""
+    bump_count_version(
+        Post, deleted=sender is Post and signal is post_delete)
+
+
+@receiver(pre_save, sender=Post)
+def remember_archive_keys(sender, instance, **kwargs):
+    # Пост с заданным pk может перезаписать существующую строку, даже
+    # если объект новый (например, при loaddata).
+    saved = None
+    if instance.pk is not None:
+        saved = Post.objects.filter(pk=instance.pk).values(
+            'pub_date', 'author_id', 'group_id').first()
+    instance._saved_archive_keys = (
+        archive.post_keys(Post(**saved)) if saved else [])
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, **kwargs):
+    """Новый пост, смена группы, автора или даты меняют счётчики архива."""
+    changes = Counter(archive.post_keys(instance))
+    changes.subtract(instance._saved_archive_keys)
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if changes:
+        archive.change(changes)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    archive.change({key: -1 for key in archive.post_keys(instance)})
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    instance._post_pks = list(
+        Post.objects.filter(group=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_counts(sender, instance, **kwargs):
+    # Посты группы отвязываются запросом UPDATE без сигналов.
+    MonthlyCount.objects.filter(
+        kind=MonthlyCount.GROUP, object_id=instance.pk).delete()
+    post_cache.forget(getattr(instance, '_post_pks', []))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def refresh_new_posts(sender, **kwargs):
+    new_posts.posts_changed()
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def refresh_followed_posts(sender, instance, **kwargs):
+    new_posts.follows_changed(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def refresh_group_index(sender, **kwargs):
+    invalidate_group_index()
+
+
+@receiver(post_save, sender=Comment)
+def notify_about_comment(sender, instance, created, **kwargs):
+    if created:
+        notify([Notification(
+            recipient_id=instance.post.author_id,
+            actor_id=instance.author_id,
+            kind=Notification.COMMENT,
+            post_id=instance.post_id)])
+
+
+@receiver(post_save, sender=Follow)
+def notify_about_follower(sender, instance, created, **kwargs):
+    if created:
+        notify([Notification(
+            recipient_id=instance.author_id,
+            actor_id=instance.user_id,
+            kind=Notification.FOLLOW)])
+
+
+@receiver(user_logged_in)
+def warm_unread_count(sender, user, **kwargs):
+    """Счётчик уведомлений считается при входе, а не на первой странице."""
+    unread_count(user)
@@ -0,0 +1,155 @@
+"""Карты сайта для поисковых роботов.
+
+Каждый раздел делится на части по диапазонам первичного ключа: в часть
+``n`` попадают объекты с ключом из ``(n * limit, (n + 1) * limit]``,
+поэтому в ней не больше ``SITEMAP_LIMIT`` адресов, а её адрес не меняется
+при добавлении новых объектов. Часть читается из БД пачками по ключу,
+без OFFSET, и пишется в ответ по мере чтения.
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.urls import reverse
+
+from .hidden import hidden, visible
+from .models import Deletion, Group, Post, User
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def keyset(queryset, lower, upper):
+    """Строки ``values_list`` с ключом первым полем, пачками по ключу."""
+    while True:
+        rows = list(queryset.filter(
+            pk__gt=lower, pk__lte=upper).order_by('pk')[
+                :settings.SITEMAP_CHUNK])
+        if not rows:
+            return
+        yield rows
+        lower = rows[-1][0]
+
+
+def post_urls(lower, upper):
+    posts = visible(Post.objects.all()).values_list('pk', 'pub_date')
+    for rows in keyset(posts, lower, upper):
+        yield [
+            (reverse('posts:post_detail', args=[pk]), pub_date)
+            for pk, pub_date in rows
+        ]
+
+
+def profile_urls(lower, upper):
+    users = User.objects.exclude(pk__in=hidden(Deletion.USER)).annotate(
+        lastmod=Max('posts__pub_date')).filter(
+            lastmod__isnull=False).values_list('pk', 'username', 'lastmod')
+    for rows in keyset(users, lower, upper):
+        yield [
+            (reverse('posts:profile', args=[username]), lastmod)
+            for _, username, lastmod in rows
+        ]
+
+
+def group_urls(lower, upper):
+    groups = Group.objects.exclude(pk__in=hidden(Deletion.GROUP)).annotate(
+        lastmod=Max('posts__pub_date')).values_list('pk', 'slug', 'lastmod')
+    for rows in keyset(groups, lower, upper):
+        yield [
+            (reverse('posts:group_posts', args=[slug]), lastmod)
+            for _, slug, lastmod in rows
+        ]
+
+
+# Раздел: модель, по ключу которой он делится, поле постов с этим
+# ключом для даты изменения части и генератор адресов.
+SECTIONS = {
+    'posts': (Post, 'pk', post_urls),
+    'profiles': (User, 'author_id', profile_urls),
+    'groups': (Group, 'group_id', group_urls),
+}
+
+
+def _cached(key, compute):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.SITEMAP_CACHE_SECONDS)
+    return value
+
+
+def shard_range(shard):
+    limit = settings.SITEMAP_LIMIT
+    return shard * limit, (shard + 1) * limit
+
+
+def shard_count(section):
+    model = SECTIONS[section][0]
+
+    def compute():
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return -(-last_pk // settings.SITEMAP_LIMIT)
+
+    return _cached(f'sitemap:{section}:shards', compute)
+
+
+def shard_lastmod(section, shard):
+    """Дата самого свежего поста в части или ``None``."""
+    field = SECTIONS[section][1]
+    lower, upper = shard_range(shard)
+
+    def compute():
+        # Пустые части кэшируются как False: None кэш не отличает
+        # от отсутствия значения.
+        return Post.objects.filter(**{
+            f'{field}__gt': lower, f'{field}__lte': upper,
+        }).aggregate(last=Max('pub_date'))['last'] or False
+
+    return _cached(f'sitemap:{section}:{shard}:lastmod', compute) or None
+
+
+def index_lastmod():
+    lastmods = [
+        shard_lastmod(section, shard)
+        for section in SECTIONS
+        for shard in range(shard_count(section))
+    ]
+    return max(filter(None, lastmods), default=None)
+
+
+def _url(base, path, lastmod):
+    lastmod = f'<lastmod>{lastmod.isoformat()}</lastmod>' if lastmod else ''
+    return f'<loc>{escape(base + path)}</loc>{lastmod}'
+
+
+def render_index(base):
+    parts = [XML_HEADER, f'<sitemapindex xmlns="{NAMESPACE}">\n']
+    for section in SECTIONS:
+        for shard in range(shard_count(section)):
+            path = reverse('posts:sitemap_section', args=[section, shard])
+            parts.append(
+                f'<sitemap>{_url(base, path, shard_lastmod(section, shard))}'
+                '</sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
+
+
+def stream_shard(base, section, shard):
+    """Отдаёт XML части кусками и кэширует его, дойдя до конца."""
+    key = f'sitemap:{section}:{shard}:{base}'
+    body = cache.get(key)
+    if body is not None:
+        yield body
+        return
+    parts = [XML_HEADER, f'<urlset xmlns="{NAMESPACE}">\n']
+    yield ''.join(parts)
+    for urls in SECTIONS[section][2](*shard_range(shard)):
+        chunk = ''.join(
+            f'<url>{_url(base, path, lastmod)}</url>\n'
+            for path, lastmod in urls)
+        parts.append(chunk)
+        yield chunk
+    parts.append('</urlset>\n')
+    yield parts[-1]
+    cache.set(key, ''.join(parts), settings.SITEMAP_CACHE_SECONDS)
@@ -0,0 +1,25 @@
+"""Фоновые задачи приложения posts."""
+from core.tasks import task
+
+from . import warmup
+from .models import Post
+
+# Миниатюры, которые выводят шаблоны лент и страницы поста.
+THUMBNAILS = (('960x339', {'crop': 'center', 'upscale': True}),)
+
+
+@task(unique=True)
+def rerender_first_pages(post_id):
+    warmup.refresh_first_pages(post_id)
+
+
+@task(unique=True)
+def make_thumbnails(post_id):
+    """Создаёт миниатюры заранее, чтобы их не ждал первый читатель."""
+    # Pillow и движок sorl нужны только обработчику задач.
+    from sorl.thumbnail import get_thumbnail
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None and post.image:
+        for geometry, options in THUMBNAILS:
+            get_thumbnail(post.image, geometry, **options)
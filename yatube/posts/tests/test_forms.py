@@ -8,9 +8,11 @@ from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
 
-
+from posts.forms import PostForm
 from posts.models import Post, User, Group
+from posts.widgets import GroupAutocompleteWidget
 from posts.tests.test_views import create_redirect_url
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -178,3 +180,55 @@ class CommentTest(TestCase):
         )
         comment = CommentTest.post.comments.get()
         self.assertEqual(comment.text, CommentTest.form_data['text'])
+
+
+class GroupChoicesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Test_user')
+        cls.groups = [
+            Group.objects.create(title=title, slug=slug)
+            for title, slug in (
+                ('Кошки', 'cats'), ('Котлеты', 'cutlets'), ('Собаки', 'dogs')
+            )
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(GroupChoicesTest.user)
+
+    def test_group_choices_are_cached(self):
+        """Список групп формы берётся из кэша."""
+        str(PostForm()['group'])
+        with self.assertNumQueries(0):
+            html = str(PostForm()['group'])
+        for group in GroupChoicesTest.groups:
+            with self.subTest(group=group):
+                self.assertIn(group.title, html)
+
+    def test_new_group_invalidates_choices(self):
+        """Новая группа сразу появляется в форме."""
+        str(PostForm()['group'])
+        Group.objects.create(title='Хомяки', slug='hamsters')
+        self.assertIn('Хомяки', str(PostForm()['group']))
+
+    @override_settings(GROUP_AUTOCOMPLETE_THRESHOLD=2)
+    def test_autocomplete_for_many_groups(self):
+        """При большом числе групп вместо списка выводится поиск."""
+        form = PostForm()
+        self.assertIsInstance(
+            form.fields['group'].widget, GroupAutocompleteWidget)
+        self.assertNotIn('Собаки', str(form['group']))
+
+    def test_autocomplete_endpoint(self):
+        """Поиск групп по началу названия без учёта регистра."""
+        response = self.authorized_client.get(
+            reverse('posts:group_autocomplete'), {'q': 'кот'})
+        self.assertEqual(
+            [group['title'] for group in response.json()['results']],
+            ['Котлеты'])
+        response = self.authorized_client.get(
+            reverse('posts:group_autocomplete'), {'q': 'К'})
+        self.assertEqual(len(response.json()['results']), 2)
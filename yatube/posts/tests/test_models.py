@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from ..models import Group, Post
+from ..previews import make_preview
 
 User = get_user_model()
 
@@ -57,3 +58,11 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+    def test_preview_is_cut_at_word_boundary(self):
+        """Превью обрезается по границе слова."""
+        self.assertEqual(make_preview('Короткий текст', 20), 'Короткий текст')
+        self.assertEqual(
+            make_preview('Первое второе, третье', 17), 'Первое второе…')
+        self.assertEqual(
+            make_preview('Первое второе, третье', 14), 'Первое второе…')
@@ -1,18 +1,40 @@
 from datetime import datetime as dt
 from http import HTTPStatus
+from io import StringIO
+import os
+import re
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core import mail
 
 from django.urls import reverse
-from posts.models import Group, Post, Follow
+from django.utils import timezone
+from posts import archive, view_counts
+from posts.models import (
+    Comment, Deletion, FeedCursor, Group, Like, LikeCounter, MonthlyCount,
+    Post, PostViews, Follow, Notification
+)
+from core import write_behind
+from posts.caches import post_cache
+from posts.deletion import schedule_deletion
 from posts.forms import PostForm
+from posts.group_index import group_choices
+from posts.likes import likes_number
+from posts.notifications import send_digests
 
 User = get_user_model()
 
@@ -195,6 +217,13 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     posts_per_second_page)
 
+    def test_out_of_range_page_not_found(self):
+        """Несуществующая страница паджинатора отдаёт 404."""
+        for address in PaginatorViewsTest.links:
+            with self.subTest(adress=address):
+                response = self.client.get(address + '?page=3')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
 
 class CreatePostViewsTest(TestCase):
 
@@ -351,6 +380,919 @@ class CacheTest(TestCase):
             CacheTest.post.text
         )
 
+    def test_cache_index_page_varies_on_page_number(self):
+        """Каждая страница ленты кэшируется отдельно."""
+        cache.clear()
+        Post.objects.bulk_create([
+            Post(text=f'Пост {number}', author=CacheTest.user)
+            for number in range(settings.POSTS_PER_PAGE)
+        ])
+        first_page = self.unauthorized_client.get(reverse('posts:index'))
+        second_page = self.unauthorized_client.get(
+            reverse('posts:index') + '?page=2')
+        self.assertNotContains(first_page, CacheTest.post.text)
+        self.assertContains(second_page, CacheTest.post.text)
+
+
+class FeedCommentStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', group=cls.group, author=cls.user)
+        cls.links = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_posts',
+                kwargs={'slug': FeedCommentStatsTest.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': FeedCommentStatsTest.user}
+            ),
+            reverse('posts:follow_index'),
+        ]
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedCommentStatsTest.user)
+        Follow.objects.create(
+            user=FeedCommentStatsTest.user, author=FeedCommentStatsTest.user)
+
+    def count_queries(self, address):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(address)
+        return len(queries)
+
+    def test_comment_stats_in_context(self):
+        """Карточки знают число комментариев и дату последнего."""
+        Comment.objects.create(
+            post=FeedCommentStatsTest.post,
+            author=FeedCommentStatsTest.user,
+            text='Комментарий')
+        for address in FeedCommentStatsTest.links:
+            with self.subTest(address=address):
+                cache.clear()
+                response = self.authorized_client.get(address)
+                post = response.context['page_obj'][0]
+                self.assertEqual(post.comments_number, 1)
+                self.assertIsNotNone(post.last_commented)
+
+    def test_queries_do_not_grow_with_cards(self):
+        """Число запросов ленты не зависит от числа карточек."""
+        for address in FeedCommentStatsTest.links:
+            single_card = self.count_queries(address)
+            Post.objects.bulk_create([
+                Post(
+                    text='Тестовый текст',
+                    group=FeedCommentStatsTest.group,
+                    author=FeedCommentStatsTest.user)
+                for _ in range(settings.POSTS_PER_PAGE - 1)
+            ])
+            Comment.objects.bulk_create([
+                Comment(
+                    post=post, author=FeedCommentStatsTest.user, text='К')
+                for post in Post.objects.all()
+            ])
+            with self.subTest(address=address):
+                self.assertEqual(self.count_queries(address), single_card)
+            Post.objects.exclude(pk=FeedCommentStatsTest.post.pk).delete()
+
+
+class PreviewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        cls.post = Post.objects.create(
+            text='Длинный текст ' * 200, group=cls.group, author=cls.user)
+        Follow.objects.create(user=cls.user, author=cls.user)
+        cls.links = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:follow_index'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PreviewTest.user)
+
+    def test_feeds_show_preview_without_full_text(self):
+        """Ленты выводят превью и не читают из БД полный текст."""
+        post = PreviewTest.post
+        self.assertTrue(post.preview_truncated)
+        for address in PreviewTest.links:
+            with self.subTest(address=address):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(address)
+                self.assertContains(response, post.text_preview)
+                self.assertContains(response, 'читать дальше')
+                self.assertNotContains(response, post.text.strip())
+                for query in queries:
+                    self.assertNotIn('"posts_post"."text",', query['sql'])
+
+    def test_post_detail_shows_full_text(self):
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[PreviewTest.post.pk]))
+        self.assertContains(response, PreviewTest.post.text.strip())
+
+    def test_preview_follows_edit(self):
+        post = PreviewTest.post
+        post.text = 'Короткий текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_preview, 'Короткий текст')
+        self.assertFalse(post.preview_truncated)
+
+
+@override_settings(SITEMAP_LIMIT=2, SITEMAP_CHUNK=1)
+class SitemapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', group=cls.group, author=cls.user)
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def shard_urls(self, section):
+        index = self.client.get(reverse('posts:sitemap')).content.decode()
+        urls = []
+        shard = 0
+        while f'sitemap-{section}-{shard}.xml' in index:
+            response = self.client.get(
+                reverse('posts:sitemap_section', args=[section, shard]))
+            shard_urls = re.findall(
+                r'<loc>http://testserver([^<]+)</loc>',
+                b''.join(response.streaming_content).decode())
+            self.assertLessEqual(len(shard_urls), 2)
+            urls += shard_urls
+            shard += 1
+        return urls
+
+    def test_sections_are_split_into_shards(self):
+        """Карта сайта делится на части и перечисляет все объекты."""
+        self.assertEqual(self.shard_urls('posts'), [
+            reverse('posts:post_detail', args=[post.pk])
+            for post in SitemapTest.posts
+        ])
+        self.assertIn(
+            reverse('posts:profile', args=[SitemapTest.user.username]),
+            self.shard_urls('profiles'))
+        self.assertIn(
+            reverse('posts:group_posts', args=[SitemapTest.group.slug]),
+            self.shard_urls('groups'))
+
+    def test_shard_is_cached_and_supports_conditional_get(self):
+        post = SitemapTest.posts[0]
+        address = reverse(
+            'posts:sitemap_section',
+            args=['posts', (post.pk - 1) // 2])
+        response = self.client.get(address)
+        body = b''.join(response.streaming_content)
+        self.assertIn(post.pub_date.isoformat().encode(), body)
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(address)
+            self.assertEqual(b''.join(cached.streaming_content), body)
+        self.assertEqual(len(queries), 0)
+        not_modified = self.client.get(
+            address, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_unknown_shard_returns_404(self):
+        for section, shard in (('comments', 0), ('posts', 100)):
+            with self.subTest(section=section):
+                response = self.client.get(
+                    reverse('posts:sitemap_section', args=[section, shard]))
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug')
+        cls.post = Post.objects.create(
+            text='Пост в группе', group=cls.group, author=cls.user)
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.user)
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=dt(2020, 2, 10, tzinfo=timezone.utc))
+        call_command('rebuild_archive', stdout=StringIO())
+
+    def counts(self, kind, object_id=0):
+        return {
+            (day.year, day.month): number
+            for day, number in archive.months(kind, object_id)
+        }
+
+    def test_archive_shows_posts_of_month(self):
+        """Архив выбирает посты месяца и строит навигацию из счётчиков."""
+        pages = {
+            reverse('posts:archive', args=[2020, 2]): 'Старый пост',
+            reverse('posts:profile_archive', args=['StasBasov', 2020, 2]):
+                'Старый пост',
+            reverse('posts:group_archive', args=['test_slug']):
+                'Пост в группе',
+        }
+        for address, text in pages.items():
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(address)
+                posts = list(response.context['page_obj'])
+                self.assertEqual([post.text for post in posts], [text])
+                for query in queries:
+                    grouped_by = query['sql'].partition('GROUP BY')[2]
+                    self.assertNotIn('pub_date', grouped_by)
+        response = self.client.get(reverse('posts:archive'))
+        self.assertContains(response, 'Февраль 2020 (1)')
+        self.assertEqual(
+            len(response.context['months']), 2)
+
+    def test_counts_follow_writes(self):
+        post = ArchiveTest.post
+        now = timezone.localtime(post.pub_date)
+        month = (now.year, now.month)
+        self.assertEqual(self.counts(MonthlyCount.ALL)[month], 1)
+        post.group = ArchiveTest.other_group
+        post.save()
+        self.assertNotIn(
+            month, self.counts(MonthlyCount.GROUP, ArchiveTest.group.pk))
+        self.assertEqual(self.counts(
+            MonthlyCount.GROUP, ArchiveTest.other_group.pk)[month], 1)
+        Post.objects.create(text='Ещё пост', author=ArchiveTest.user)
+        self.assertEqual(self.counts(MonthlyCount.ALL)[month], 2)
+        post.delete()
+        self.assertEqual(self.counts(MonthlyCount.ALL)[month], 1)
+        self.assertEqual(self.counts(
+            MonthlyCount.AUTHOR, ArchiveTest.user.pk)[(2020, 2)], 1)
+
+    def test_overwrite_by_pk_moves_counts(self):
+        """Новый объект с pk существующего поста переносит его счётчики."""
+        Post(
+            pk=ArchiveTest.old_post.pk, text='Старый пост',
+            author=ArchiveTest.user, group=ArchiveTest.group,
+            pub_date=dt(2020, 3, 10, tzinfo=timezone.utc)).save()
+        self.assertNotIn((2020, 2), self.counts(
+            MonthlyCount.AUTHOR, ArchiveTest.user.pk))
+        self.assertEqual(self.counts(
+            MonthlyCount.GROUP, ArchiveTest.group.pk)[(2020, 3)], 1)
+        self.assertEqual(self.counts(MonthlyCount.ALL)[(2020, 3)], 1)
+
+    def test_wrong_month_returns_404(self):
+        for year, month in ((2020, 13), (0, 1), (9999, 12), (10000, 1)):
+            with self.subTest(year=year, month=month):
+                response = self.client.get(
+                    reverse('posts:archive', args=[year, month]))
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ViewCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(2)
+        ]
+        cls.posts = [
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        view_counts.flush()
+
+    def view(self, reader, post):
+        client = Client()
+        client.force_login(reader)
+        return client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+
+    def test_views_are_buffered_then_flushed(self):
+        """Просмотры видны сразу, а в БД пишутся пачкой."""
+        post = ViewCountTest.posts[0]
+        for reader in ViewCountTest.readers + ViewCountTest.readers[:1]:
+            response = self.view(reader, post)
+        self.assertEqual(response.context['post'].views, 3)
+        self.assertContains(response, 'Просмотров: 3')
+        self.assertFalse(PostViews.objects.exists())
+        view_counts.flush()
+        stats = PostViews.objects.get(post=post)
+        self.assertEqual(stats.views, 3)
+        self.assertEqual(stats.unique_viewers, 2)
+        self.view(ViewCountTest.readers[0], post)
+        view_counts.flush()
+        stats.refresh_from_db()
+        self.assertEqual((stats.views, stats.unique_viewers), (4, 2))
+
+    def test_flush_queries_do_not_grow_with_posts(self):
+        reader = ViewCountTest.readers[0]
+        self.view(reader, ViewCountTest.posts[0])
+        with CaptureQueriesContext(connection) as single:
+            view_counts.flush()
+        for post in ViewCountTest.posts:
+            self.view(reader, post)
+        with CaptureQueriesContext(connection) as many:
+            view_counts.flush()
+        self.assertEqual(len(many), len(single))
+        self.assertEqual(
+            PostViews.objects.filter(views=1).count(),
+            len(ViewCountTest.posts) - 1)
+
+
+class LikeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(3)
+        ]
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.other_post = Post.objects.create(text='Другой', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.clients = []
+        for reader in LikeTest.readers:
+            client = Client()
+            client.force_login(reader)
+            self.clients.append(client)
+
+    def like(self, client, post, name='posts:post_like', **data):
+        return client.post(
+            reverse(name, kwargs={'post_id': post.pk}), data)
+
+    def likes_number(self, post):
+        return Post.objects.annotate(
+            number=likes_number()).get(pk=post.pk).number or 0
+
+    def test_like_and_unlike(self):
+        """У поста одна строка счётчика; повторный лайк не считается."""
+        post = LikeTest.post
+        for client in self.clients:
+            self.like(client, post)
+        self.like(self.clients[0], post)
+        self.assertEqual(Like.objects.filter(post=post).count(), 3)
+        self.assertEqual(self.likes_number(post), 3)
+        self.assertEqual(LikeCounter.objects.filter(post=post).count(), 1)
+        self.like(self.clients[1], post, 'posts:post_unlike')
+        self.like(self.clients[1], post, 'posts:post_unlike')
+        self.assertEqual(self.likes_number(post), 2)
+
+    def test_get_is_not_allowed(self):
+        response = self.clients[0].get(reverse(
+            'posts:post_like', kwargs={'post_id': LikeTest.post.pk}))
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Like.objects.exists())
+
+    def test_redirects_back_to_safe_page(self):
+        client = self.clients[0]
+        self.assertRedirects(
+            self.like(client, LikeTest.post, next='/?page=1'), '/?page=1',
+            fetch_redirect_response=False)
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': LikeTest.post.pk})
+        self.assertRedirects(
+            self.like(client, LikeTest.post, next='https://evil.com/'),
+            detail)
+
+    def test_feed_shows_liked_state_from_one_query(self):
+        client = self.clients[0]
+        self.like(client, LikeTest.post)
+        self.like(self.clients[1], LikeTest.other_post)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('posts:index'))
+        self.assertEqual(response.context['liked'], {LikeTest.post.pk})
+        unlike = reverse(
+            'posts:post_unlike', kwargs={'post_id': LikeTest.post.pk})
+        self.assertContains(response, f'formaction="{unlike}"')
+        self.assertNotContains(response, reverse(
+            'posts:post_unlike', kwargs={'post_id': LikeTest.other_post.pk}))
+        like_queries = [
+            query for query in queries
+            if 'FROM "posts_like" ' in query['sql']
+        ]
+        self.assertEqual(len(like_queries), 1)
+        self.assertEqual(
+            response.context['likes'],
+            {LikeTest.post.pk: 1, LikeTest.other_post.pk: 1})
+
+    def test_feed_count_is_not_cached_with_cards(self):
+        """Число лайков в ленте — текст кнопки; оно обновляется сразу,
+        хотя карточки берутся из общего кэша."""
+        client = self.clients[0]
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, '♡ 0', count=2)
+        self.like(client, LikeTest.post)
+        response = client.get(reverse('posts:index'))
+        self.assertContains(response, '♥ 1', count=1)
+        self.assertContains(response, '♡ 0', count=1)
+        self.assertNotContains(response, 'swr-hole')
+        anonymous = self.client.get(reverse('posts:index'))
+        self.assertContains(anonymous, '♡ 1', count=1)
+
+    def test_feed_count_has_no_likes_subquery(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.clients[0].get(reverse('posts:index'))
+        counts = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT COUNT(')
+        ]
+        for sql in counts:
+            self.assertNotIn('posts_likecounter', sql)
+
+    def test_deleting_user_recounts_likes(self):
+        for client in self.clients:
+            self.like(client, LikeTest.post)
+        schedule_deletion(LikeTest.readers[0])
+        call_command('run_workers', workers=0, once=True, stdout=StringIO())
+        self.assertEqual(self.likes_number(LikeTest.post), 2)
+        self.assertEqual(
+            LikeCounter.objects.get(post=LikeTest.post).number, 2)
+
+
+class NewPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(2):
+            Post.objects.create(text=f'Пост {number}', author=cls.author)
+        cls.address = reverse('posts:follow_new_count')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(NewPostsTest.user)
+
+    def new_posts(self, **headers):
+        return self.authorized_client.get(NewPostsTest.address, **headers)
+
+    def test_counts_posts_since_last_visit(self):
+        """Считаются посты избранных авторов после визита в ленту."""
+        self.assertEqual(self.new_posts().json()['count'], 2)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(self.new_posts().json(), {'count': 0, 'label': ''})
+        Post.objects.create(text='Новый пост', author=NewPostsTest.author)
+        Post.objects.create(text='Свой пост', author=NewPostsTest.user)
+        self.assertEqual(self.new_posts().json(), {'count': 1, 'label': '1'})
+
+    def test_repeat_visit_does_not_move_cursor(self):
+        """Без новых постов повторный визит в ленту не пишет в базу."""
+        follow_index = reverse('posts:follow_index')
+        self.authorized_client.get(follow_index)
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(follow_index)
+        for query in queries:
+            self.assertNotIn('"posts_feedcursor"', query['sql'])
+        post = Post.objects.create(
+            text='Новый пост', author=NewPostsTest.author)
+        self.authorized_client.get(follow_index)
+        self.assertEqual(
+            FeedCursor.objects.get(user=NewPostsTest.user).seen_at,
+            post.pub_date)
+
+    def test_count_is_capped(self):
+        Post.objects.bulk_create([
+            Post(text='Пост', author=NewPostsTest.author)
+            for _ in range(120)
+        ])
+        self.assertEqual(
+            self.new_posts().json(), {'count': 100, 'label': '99+'})
+
+    def test_conditional_response(self):
+        response = self.new_posts()
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.new_posts(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+        for query in queries:
+            self.assertNotIn('"posts_post"', query['sql'])
+        Post.objects.create(text='Новый пост', author=NewPostsTest.author)
+        changed = self.new_posts(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, HTTPStatus.OK)
+        self.assertEqual(changed.json()['count'], 3)
+
+    def test_guest_gets_401(self):
+        response = Client().get(NewPostsTest.address)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+
+class DetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', group=cls.group, author=cls.author)
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text='Комментарий')
+            for _ in range(5)
+        ])
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # Просмотры, накопленные другими тестами, не пишутся в БД
+        # посреди проверяемого запроса.
+        view_counts.flush()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(DetailQueriesTest.user)
+
+    def test_profile_queries(self):
+        """Профиль: пользователь (сессия — из кэша), автор с подписью
+        и числом постов, COUNT страницы, страница, статистика
+        комментариев, лайки пользователя и числа лайков на странице."""
+        with self.assertNumQueries(7):
+            response = self.authorized_client.get(reverse(
+                'posts:profile',
+                kwargs={'username': DetailQueriesTest.author}))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['posts_number'], 1)
+
+    def test_post_detail_queries(self):
+        """Пост: пользователь (сессия — из кэша), пост с автором
+        и числом постов автора, комментарии с авторами."""
+        with self.assertNumQueries(3):
+            response = self.authorized_client.get(reverse(
+                'posts:post_detail',
+                kwargs={'post_id': DetailQueriesTest.post.pk}))
+        self.assertEqual(response.context['posts_number'], 1)
+        self.assertEqual(len(response.context['comments']), 5)
+
+
+class RefreshOnWriteTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(RefreshOnWriteTest.user)
+
+    def test_new_post_refreshes_first_pages(self):
+        """Новый пост сразу виден на закэшированных первых страницах."""
+        links = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_posts',
+                kwargs={'slug': RefreshOnWriteTest.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': RefreshOnWriteTest.user}
+            )
+        ]
+        for address in links:
+            self.authorized_client.get(address)
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Свежий пост', 'group': RefreshOnWriteTest.group.id}
+        )
+        for address in links:
+            with self.subTest(address=address):
+                self.assertContains(
+                    self.authorized_client.get(address), 'Свежий пост')
+
+
+@override_settings(
+    RATELIMITS={'add_comment': '2/m'}, RATELIMIT_IP_MULTIPLIER=10)
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(RateLimitTest.user)
+
+    def test_add_comment_is_limited_per_user(self):
+        """Лишний комментарий получает 429 и в новой сессии того же
+        пользователя; отказ не обращается к базе."""
+        address = reverse(
+            'posts:add_comment', kwargs={'post_id': RateLimitTest.post.pk})
+        for number in range(2):
+            response = self.authorized_client.post(
+                address, data={'text': f'Комментарий {number}'})
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        with self.assertNumQueries(0):
+            response = self.authorized_client.post(
+                address, data={'text': 'Лишний'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        other_client = Client()
+        other_client.force_login(RateLimitTest.user)
+        response = other_client.post(address, data={'text': 'Другая сессия'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertEqual(RateLimitTest.post.comments.count(), 2)
+
+
+@override_settings(WRITE_BEHIND=True)
+class WriteBehindTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(WriteBehindTest.user)
+
+    def test_comment_is_visible_before_it_is_written(self):
+        post = WriteBehindTest.post
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Отложенный комментарий'})
+        self.assertFalse(post.comments.exists())
+        detail = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        response = self.authorized_client.get(detail)
+        self.assertContains(response, 'Отложенный комментарий', count=1)
+        call_command('apply_writes', once=True)
+        self.assertEqual(post.comments.get().author, WriteBehindTest.user)
+        response = self.authorized_client.get(detail)
+        self.assertContains(response, 'Отложенный комментарий', count=1)
+
+    def test_follow_and_unfollow(self):
+        username = WriteBehindTest.author.username
+        profile = reverse('posts:profile', kwargs={'username': username})
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': username}))
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(
+            self.authorized_client.get(profile).context['following'])
+        call_command('apply_writes', once=True)
+        self.assertTrue(Follow.objects.filter(
+            user=WriteBehindTest.user, author=WriteBehindTest.author).exists())
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': username}))
+        self.assertFalse(
+            self.authorized_client.get(profile).context['following'])
+        call_command('apply_writes', once=True)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_reapplied_comment_is_not_duplicated(self):
+        """Пачка, записанная в БД, но не убранная из очереди, при
+        повторном применении не создаёт второй комментарий."""
+        post = WriteBehindTest.post
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Один раз'})
+        with mock.patch.object(write_behind.WriteQueue, 'ack'):
+            self.assertEqual(write_behind.apply_batch(), 1)
+        self.assertEqual(write_behind.apply_batch(), 1)
+        self.assertEqual(post.comments.count(), 1)
+        self.assertFalse(write_behind.pending(WriteBehindTest.user.pk))
+
+    @override_settings(WRITE_BEHIND_MAX_ATTEMPTS=2)
+    def test_failing_action_is_moved_aside(self):
+        """Действие, которое не применяется, не держит очередь."""
+        def broken(payloads):
+            raise ValueError('Не применяется')
+
+        write_behind.handler('broken')(broken)
+        self.addCleanup(write_behind._handlers.pop, 'broken')
+        user_id = WriteBehindTest.user.pk
+        broken_id = write_behind.enqueue('broken', {}, user_id)
+        self.authorized_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': WriteBehindTest.post.pk}),
+            data={'text': 'После сбоя'})
+        self.assertEqual(len(write_behind.pending(user_id)), 2)
+        with self.assertLogs('core.write_behind', 'ERROR'):
+            call_command('apply_writes', once=True, interval=0)
+        self.assertTrue(WriteBehindTest.post.comments.exists())
+        self.assertEqual(
+            [pk for pk, _, _ in write_behind.get_queue().failed()],
+            [broken_id])
+        self.assertFalse(write_behind.pending(user_id))
+
+
+class NotificationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.author = User.objects.create_user(
+            username='Author', email='author@example.com')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(NotificationTest.user)
+        self.author_client = Client()
+        self.author_client.force_login(NotificationTest.author)
+
+    def test_comment_and_follow_notify_author(self):
+        post = NotificationTest.post
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'})
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Свой комментарий'})
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': NotificationTest.author.username}))
+        self.assertEqual(
+            sorted(NotificationTest.author.notifications.values_list(
+                'kind', flat=True)),
+            [Notification.COMMENT, Notification.FOLLOW])
+        response = self.author_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['unread_notifications'](), 2)
+        self.author_client.get(reverse('posts:notifications'))
+        response = self.author_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.assertEqual(response.context['unread_notifications'](), 0)
+
+    def test_digest_is_sent_once_per_recipient(self):
+        Comment.objects.create(
+            post=NotificationTest.post, author=NotificationTest.user,
+            text='Комментарий')
+        Follow.objects.create(
+            user=NotificationTest.user, author=NotificationTest.author)
+        send_digests()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('прокомментировал', mail.outbox[0].body)
+        self.assertIn('подписался', mail.outbox[0].body)
+        send_digests()
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class BackgroundDeletionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='StasBasov')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=BackgroundDeletionTest.author,
+                group=BackgroundDeletionTest.group)
+            for number in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(
+                post=post, author=BackgroundDeletionTest.user, text='Ответ')
+        Follow.objects.create(
+            user=BackgroundDeletionTest.user,
+            author=BackgroundDeletionTest.author)
+
+    def run_workers(self):
+        with mock.patch('posts.deletion.CHUNK', 2):
+            call_command(
+                'run_workers', workers=0, once=True, stdout=StringIO())
+
+    def test_user_is_hidden_then_deleted(self):
+        author = BackgroundDeletionTest.author
+        deletion = schedule_deletion(author)
+        # Уведомления, комментарии, подписка и посты.
+        self.assertEqual(deletion.total, 6 + 5 + 1 + 5)
+        self.assertEqual(self.client.get(reverse(
+            'posts:profile', kwargs={'username': author.username}
+        )).status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts[0].pk}
+        )).status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.run_workers()
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.progress, 100)
+        self.assertFalse(User.objects.filter(pk=author.pk).exists())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+
+    def test_group_is_hidden_then_deleted(self):
+        group = BackgroundDeletionTest.group
+        schedule_deletion(group)
+        self.assertEqual(self.client.get(reverse(
+            'posts:group_posts', kwargs={'slug': group.slug}
+        )).status_code, HTTPStatus.NOT_FOUND)
+        self.assertNotIn((group.pk, group.title), group_choices())
+        self.run_workers()
+        self.assertFalse(Group.objects.filter(pk=group.pk).exists())
+        self.assertEqual(
+            Post.objects.filter(group__isnull=True).count(), 5)
+
+    def test_hidden_posts_cannot_be_commented_or_liked(self):
+        post = self.posts[0]
+        schedule_deletion(BackgroundDeletionTest.author)
+        client = Client()
+        client.force_login(BackgroundDeletionTest.user)
+        addresses = [
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            reverse('posts:post_like', kwargs={'post_id': post.pk}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = client.post(address, data={'text': 'Поздно'})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(post.comments.count(), 1)
+        self.assertFalse(Like.objects.exists())
+
+    def test_admin_delete_is_scheduled(self):
+        """Удаление из админки ставится в очередь, а не выполняется."""
+        group = BackgroundDeletionTest.group
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_group_changelist'))
+        self.assertNotIn(
+            'delete_selected', dict(response.context['action_form']
+                                    .fields['action'].choices))
+        client.post(
+            reverse('admin:posts_group_delete', args=[group.pk]),
+            {'post': 'yes'})
+        self.assertTrue(Group.objects.filter(pk=group.pk).exists())
+        self.assertTrue(Deletion.objects.filter(
+            kind=Deletion.GROUP, object_id=group.pk).exists())
+
+    def test_group_delete_forgets_cached_posts(self):
+        post = self.posts[0]
+        self.assertIsNotNone(post_cache.get(post.pk).group_id)
+        Group.objects.get(pk=BackgroundDeletionTest.group.pk).delete()
+        self.assertIsNone(post_cache.get(post.pk).group_id)
+
+
+class WarmCachesCommandTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='StasBasov')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug')
+        Post.objects.create(
+            text='Тестовый текст', group=self.group, author=self.user)
+        cache.clear()
+
+    def test_warm_caches_fills_feed_fragments(self):
+        """warm_caches заполняет кэш первых страниц лент."""
+        call_command('warm_caches', pages=1, stdout=open(os.devnull, 'w'))
+        keys = [
+            make_template_fragment_key('index_page', [1]),
+            make_template_fragment_key('group_page', [self.group.pk, 1]),
+            make_template_fragment_key('profile_page', [self.user.pk, 1]),
+        ]
+        for key in keys:
+            with self.subTest(key=key):
+                self.assertIsNotNone(cache.get(key))
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -9,13 +9,56 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path(
+        'groups/autocomplete/',
+        views.group_autocomplete,
+        name='group_autocomplete'
+    ),
+    path('archive/', views.archive_index, name='archive'),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.archive_index,
+        name='archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/new/', views.follow_new_count, name='follow_new_count'),
+    path(
+        'notifications/',
+        views.notifications,
+        name='notifications'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path(
+        'posts/<int:post_id>/unlike/',
+        views.post_unlike,
+        name='post_unlike'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -26,4 +69,10 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path(
+        'sitemap-<str:section>-<int:shard>.xml',
+        views.sitemap_section,
+        name='sitemap_section'
+    ),
 ]
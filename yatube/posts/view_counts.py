@@ -0,0 +1,114 @@
+"""Счётчики просмотров постов с записью в БД пачками.
+
+Просмотры копятся в памяти процесса и раз в
+``VIEW_COUNT_FLUSH_INTERVAL`` секунд после ответа записываются одной
+транзакцией: по одному UPDATE на каждое встретившееся приращение,
+а скетчи уникальных читателей объединяются с сохранёнными.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.after_response import run_after_response
+from core.hyperloglog import HyperLogLog
+
+from .models import Post, PostViews
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_views = Counter()
+_viewers = defaultdict(HyperLogLog)
+_last_flush = time.monotonic()
+
+
+def viewer_id(request):
+    """Кто смотрит: пользователь, сессия или адрес с браузером."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return f'session:{session_key}'
+    return 'client:{}:{}'.format(
+        request.META.get('REMOTE_ADDR', ''),
+        request.META.get('HTTP_USER_AGENT', ''))
+
+
+def record_view(request, post_id):
+    with _lock:
+        _views[post_id] += 1
+        _viewers[post_id].add(viewer_id(request))
+        due = (
+            time.monotonic() - _last_flush
+            >= settings.VIEW_COUNT_FLUSH_INTERVAL
+            or len(_views) >= settings.VIEW_COUNT_MAX_PENDING
+        )
+    if due:
+        run_after_response(flush)
+
+
+def pending_views(post_id):
+    """Просмотры поста, ещё не записанные в БД этим процессом."""
+    return _views.get(post_id, 0)
+
+
+def flush():
+    """Записывает накопленные просмотры в БД."""
+    global _views, _viewers, _last_flush
+    with _lock:
+        views, viewers = _views, _viewers
+        _views, _viewers = Counter(), defaultdict(HyperLogLog)
+        _last_flush = time.monotonic()
+    if not views:
+        return
+    try:
+        _write(views, viewers)
+    except Exception:
+        # Не теряем просмотры: они запишутся со следующей пачкой.
+        with _lock:
+            _views.update(views)
+            for post_id, sketch in viewers.items():
+                _viewers[post_id].merge(sketch)
+        raise
+
+
+def _write(views, viewers):
+    with transaction.atomic():
+        existing = set(Post.objects.filter(
+            pk__in=list(views)).values_list('pk', flat=True))
+        # Вставка берёт блокировку записи SQLite, поэтому скетчи ниже
+        # читаются и пишутся без гонки с другими процессами.
+        PostViews.objects.bulk_create(
+            [PostViews(post_id=post_id) for post_id in existing],
+            ignore_conflicts=True)
+        by_increment = defaultdict(list)
+        for post_id in existing:
+            by_increment[views[post_id]].append(post_id)
+        for number, post_ids in by_increment.items():
+            PostViews.objects.filter(post_id__in=post_ids).update(
+                views=F('views') + number)
+        stats = list(PostViews.objects.select_for_update().filter(
+            post_id__in=existing).only('post_id', 'viewers_sketch'))
+        for row in stats:
+            sketch = HyperLogLog.from_bytes(bytes(row.viewers_sketch))
+            sketch.merge(viewers[row.post_id])
+            row.viewers_sketch = sketch.to_bytes()
+            row.unique_viewers = sketch.count()
+        PostViews.objects.bulk_update(
+            stats, ['viewers_sketch', 'unique_viewers'])
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Просмотры не записаны при остановке процесса')
+
+
+atexit.register(_flush_at_exit)
@@ -1,69 +1,227 @@
+import uuid
+from datetime import MAXYEAR, MINYEAR
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import (
+    Count, Exists, F, IntegerField, OuterRef, Subquery
+)
+from django.db.models.functions import Coalesce
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import is_safe_url
+from django.views.decorators.http import condition, require_POST
+
+from core.paginator import CachedCountPaginator
+from core.ratelimit import ratelimit
+from core.write_behind import enqueue
 
+from . import archive, new_posts
+from .caches import group_cache, post_cache, user_cache
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .group_index import search_groups
+from .hidden import author_hidden, hidden, hidden_posts, is_hidden, visible
+from .likes import like, liked_posts, likes_number, likes_numbers, unlike
+from .models import (
+    Deletion, Follow, Like, MonthlyCount, Notification, Post, User
+)
+from .notifications import mark_read
+from .sitemaps import (
+    SECTIONS, index_lastmod, render_index, shard_count, shard_lastmod,
+    stream_shard
+)
+from .view_counts import pending_views, record_view
+from .write_behind import pending_comments, pending_following
+
+
+def posts_number_subquery(author_field):
+    """Подзапрос с числом постов автора из поля ``author_field``."""
+    return Subquery(
+        Post.objects.filter(author=OuterRef(author_field)).order_by().values(
+            'author').annotate(number=Count('pk')).values('number'),
+        output_field=IntegerField())
+
+
+def pagination(request, posts, **estimate):
+    paginator = CachedCountPaginator(
+        posts, settings.POSTS_PER_PAGE, **estimate)
+    try:
+        return paginator.page(request.GET.get('page') or 1)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        raise Http404('Такой страницы нет')
 
 
-def pagination(request, posts):
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def visible_post_or_404(post_id):
+    """Пост из кэша; пост удаляемого автора нельзя комментировать
+    и лайкать."""
+    post = post_cache.get_or_404(pk=post_id)
+    if author_hidden(post):
+        raise Http404('Автор удаляется')
+    return post
 
 
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.select_related(
+        'author', 'group').defer('text').with_comment_stats()
+    # Без этих подсказок фильтр visible отключил бы оценку COUNT.
+    page_obj = pagination(
+        request, visible(posts), unfiltered=posts, excluded=hidden_posts())
     context = {
-        'page_obj': pagination(request, posts),
+        'page_obj': page_obj,
+        'liked': liked_posts(request.user, page_obj.object_list),
+        'likes': likes_numbers(page_obj.object_list),
     }
     return render(request, 'posts/index.html', context)
 
 
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    group = group_cache.get_or_404(slug=slug)
+    if hidden(Deletion.GROUP).filter(object_id=group.pk).exists():
+        raise Http404('Группа удаляется')
+    posts = visible(group.posts.select_related(
+        'author', 'group').defer('text').with_comment_stats())
+    page_obj = pagination(request, posts)
     context = {
         'group': group,
-        'page_obj': pagination(request, posts),
+        'page_obj': page_obj,
+        'liked': liked_posts(request.user, page_obj.object_list),
+        'likes': likes_numbers(page_obj.object_list),
     }
     return render(request, 'posts/group_list.html', context)
 
 
 def profile(request, username):
-    user_obj = get_object_or_404(User, username=username)
-    posts = user_obj.posts.all()
-    posts_number = posts.count()
-    following = (request.user.is_authenticated
-                 and Follow.objects.filter(
-                     user=request.user,
-                     author=user_obj).exists())
+    user_obj = get_object_or_404(
+        User.objects.annotate(
+            posts_number=Coalesce(posts_number_subquery('pk'), 0),
+            is_following=Exists(Follow.objects.filter(
+                user_id=request.user.pk, author=OuterRef('pk'))),
+            is_hidden=is_hidden(Deletion.USER)),
+        username=username)
+    if user_obj.is_hidden:
+        raise Http404('Пользователь удаляется')
+    posts = user_obj.posts.select_related(
+        'author', 'group').defer('text').with_comment_stats()
+    following = user_obj.is_following
+    if settings.WRITE_BEHIND and request.user.is_authenticated:
+        following = pending_following(request.user, user_obj, following)
+    page_obj = pagination(request, posts)
     context = {
         'username': user_obj,
-        'posts_number': posts_number,
-        'page_obj': pagination(request, posts),
+        'posts_number': user_obj.posts_number,
+        'page_obj': page_obj,
+        'liked': liked_posts(request.user, page_obj.object_list),
+        'likes': likes_numbers(page_obj.object_list),
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+def render_archive(request, posts, kind, object_id, url, context):
+    """Посты за месяц и навигация по месяцам из счётчиков архива.
+
+    Без года и месяца в адресе показывается последний месяц с постами.
+    """
+    months = archive.months(kind, object_id)
+    year, month = context.pop('year'), context.pop('month')
+    if year is None and months:
+        year, month = months[0][0].year, months[0][0].month
+    page_obj = None
+    if year is not None:
+        # Конец декабря MAXYEAR уже не помещается в datetime.
+        if not (MINYEAR <= year < MAXYEAR and 1 <= month <= 12):
+            raise Http404('Такого месяца нет')
+        start, end = archive.month_range(year, month)
+        page_obj = pagination(request, posts.filter(
+            pub_date__gte=start, pub_date__lt=end).select_related(
+                'author', 'group').defer('text').with_comment_stats())
+        context['current'] = start
+        context['liked'] = liked_posts(request.user, page_obj.object_list)
+        context['likes'] = likes_numbers(page_obj.object_list)
+    context.update({
+        'page_obj': page_obj,
+        'months': [
+            (first_day, number, url(first_day))
+            for first_day, number in months
+        ],
+    })
+    return render(request, 'posts/archive.html', context)
+
+
+def archive_index(request, year=None, month=None):
+    return render_archive(
+        request, visible(Post.objects.all()), MonthlyCount.ALL, 0,
+        lambda day: reverse('posts:archive', args=[day.year, day.month]),
+        {'title': 'Архив', 'year': year, 'month': month})
+
+
+def group_archive(request, slug, year=None, month=None):
+    group = group_cache.get_or_404(slug=slug)
+    if hidden(Deletion.GROUP).filter(object_id=group.pk).exists():
+        raise Http404('Группа удаляется')
+    return render_archive(
+        request, visible(group.posts.all()), MonthlyCount.GROUP, group.pk,
+        lambda day: reverse(
+            'posts:group_archive', args=[slug, day.year, day.month]),
+        {'title': f'Архив группы {group}', 'year': year, 'month': month})
+
+
+def profile_archive(request, username, year=None, month=None):
+    author = user_cache.get_or_404(username=username)
+    if hidden(Deletion.USER).filter(object_id=author.pk).exists():
+        raise Http404('Пользователь удаляется')
+    return render_archive(
+        request, author.posts.all(), MonthlyCount.AUTHOR, author.pk,
+        lambda day: reverse(
+            'posts:profile_archive', args=[username, day.year, day.month]),
+        {'title': f'Архив постов {author}', 'year': year, 'month': month})
+
+
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
-    author = post.author
-    posts_number = author.posts.all().count()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').annotate(
+            author_posts_number=posts_number_subquery('author'),
+            author_hidden=is_hidden(Deletion.USER, 'author'),
+            views=Coalesce(F('view_stats__views'), 0),
+            unique_viewers=Coalesce(F('view_stats__unique_viewers'), 0),
+            likes_number=Coalesce(likes_number(), 0),
+            liked=Exists(Like.objects.filter(
+                user_id=request.user.pk, post=OuterRef('pk')))),
+        pk=post_id)
+    if post.author_hidden:
+        raise Http404('Автор удаляется')
+    record_view(request, post.pk)
+    post.views += pending_views(post.pk)
+    comments = list(post.comments.select_related('author'))
+    if settings.WRITE_BEHIND and request.user.is_authenticated:
+        comments += pending_comments(request.user, post, comments)
     form = CommentForm()
     context = {
-        'author': author,
+        'author': post.author,
         'post': post,
-        'posts_number': posts_number,
+        'posts_number': post.author_posts_number,
         'form': form,
         'comments': comments
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@login_required
+def group_autocomplete(request):
+    groups = search_groups(request.GET.get('q', '').strip())
+    return JsonResponse({
+        'results': [{'id': pk, 'title': title} for pk, title in groups]
+    })
+
+
+@ratelimit('post_create')
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -84,7 +242,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = post_cache.get_or_404(pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
@@ -103,11 +261,19 @@ def post_edit(request, post_id):
          'is_edit': True})
 
 
+@ratelimit('add_comment')
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = visible_post_or_404(post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.WRITE_BEHIND:
+        enqueue('comment', {
+            'id': uuid.uuid4().hex,
+            'post': post.pk,
+            'author': request.user.pk,
+            'text': form.cleaned_data['text'],
+        }, user_id=request.user.pk)
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
@@ -115,21 +281,89 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def _back_to_page(request, post_id):
+    next_url = request.POST.get('next')
+    if next_url and is_safe_url(
+            next_url, allowed_hosts={request.get_host()},
+            require_https=request.is_secure()):
+        return redirect(next_url)
+    return redirect('posts:post_detail', post_id=post_id)
+
+
+@require_POST
+@ratelimit('like')
+@login_required
+def post_like(request, post_id):
+    post = visible_post_or_404(post_id)
+    like(request.user, post)
+    return _back_to_page(request, post_id)
+
+
+@require_POST
+@ratelimit('like')
+@login_required
+def post_unlike(request, post_id):
+    post = visible_post_or_404(post_id)
+    unlike(request.user, post)
+    return _back_to_page(request, post_id)
+
+
 @login_required
 def follow_index(request):
     user = request.user
-    posts = Post.objects.filter(author__following__user=user).all()
+    posts = visible(Post.objects.filter(
+        author__following__user=user).select_related(
+            'author', 'group').defer('text').with_comment_stats())
+    page_obj = pagination(request, posts)
+    if page_obj.number == 1 and page_obj.object_list:
+        # Прочитано всё до самого свежего поста на первой странице.
+        new_posts.mark_seen(
+            user, max(post.pub_date for post in page_obj.object_list))
     context = {
-        'page_obj': pagination(request, posts)
+        'page_obj': page_obj,
+        'liked': liked_posts(request.user, page_obj.object_list),
+        'likes': likes_numbers(page_obj.object_list),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def _new_posts_etag(request):
+    if request.user.is_authenticated:
+        return new_posts.etag(request.user.pk)
+
+
+@condition(etag_func=_new_posts_etag)
+def follow_new_count(request):
+    """Сколько новых постов в ленте подписок; для опроса со страницы."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'count': 0, 'label': ''}, status=401)
+    count = new_posts.new_posts_count(request.user)
+    response = JsonResponse({
+        'count': count,
+        'label': new_posts.label(count) if count else '',
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def notifications(request):
+    events = list(Notification.objects.filter(
+        recipient=request.user).select_related('actor')[:50])
+    mark_read(request.user)
+    return render(
+        request, 'posts/notifications.html', {'notifications': events})
+
+
+@ratelimit('profile_follow', methods=('GET', 'POST'))
 @login_required
 def profile_follow(request, username):
     user = request.user
-    user_to_follow = get_object_or_404(User, username=username)
-    if user != user_to_follow:
+    user_to_follow = user_cache.get_or_404(username=username)
+    if user != user_to_follow and settings.WRITE_BEHIND:
+        enqueue('follow', {'user': user.pk, 'author': user_to_follow.pk},
+                user_id=user.pk)
+    elif user != user_to_follow:
         obj, created = Follow.objects.get_or_create(
             user=user,
             author=user_to_follow)
@@ -140,7 +374,34 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     # Дизлайк, отписка
     user = request.user
-    user_to_follow = get_object_or_404(User, username=username)
-    if user != user_to_follow:
+    user_to_follow = user_cache.get_or_404(username=username)
+    if user != user_to_follow and settings.WRITE_BEHIND:
+        enqueue('unfollow', {'user': user.pk, 'author': user_to_follow.pk},
+                user_id=user.pk)
+    elif user != user_to_follow:
         Follow.objects.filter(user=user, author=user_to_follow).delete()
     return redirect('posts:profile', username=user_to_follow)
+
+
+def _site(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+@condition(last_modified_func=lambda request: index_lastmod())
+def sitemap_index(request):
+    return HttpResponse(
+        render_index(_site(request)), content_type='application/xml')
+
+
+def _shard_lastmod(request, section, shard):
+    if section in SECTIONS:
+        return shard_lastmod(section, shard)
+
+
+@condition(last_modified_func=_shard_lastmod)
+def sitemap_section(request, section, shard):
+    if section not in SECTIONS or shard >= shard_count(section):
+        raise Http404('Такой карты сайта нет')
+    return StreamingHttpResponse(
+        stream_shard(_site(request), section, shard),
+        content_type='application/xml')
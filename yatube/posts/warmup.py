@@ -0,0 +1,99 @@
+"""Прогрев кэшей лент и обновление первых страниц после записи."""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.db.models import Count
+from django.http import Http404
+from django.urls import resolve, reverse
+
+from core.health import mark_warmed
+from core.swr import force_refresh
+
+from .models import Group, Post, User
+
+
+def first_page_keys(post):
+    """Ключи фрагментов первых страниц лент, в которые попадает пост."""
+    keys = [
+        make_template_fragment_key('index_page', [1]),
+        make_template_fragment_key('profile_page', [post.author_id, 1]),
+    ]
+    if post.group_id:
+        keys.append(
+            make_template_fragment_key('group_page', [post.group_id, 1]))
+    return keys
+
+
+def first_page_urls(post):
+    urls = [
+        reverse('posts:index'),
+        reverse('posts:profile', args=[post.author.username]),
+    ]
+    if post.group_id:
+        urls.append(reverse('posts:group_posts', args=[post.group.slug]))
+    return urls
+
+
+def feed_urls(pages, groups, authors):
+    """Первые ``pages`` страниц общей ленты, популярных групп и авторов."""
+    feeds = [reverse('posts:index')]
+    popular_groups = Group.objects.annotate(
+        posts_number=Count('posts')).order_by('-posts_number')[:groups]
+    feeds += [
+        reverse('posts:group_posts', args=[group.slug])
+        for group in popular_groups
+    ]
+    top_authors = User.objects.annotate(
+        posts_number=Count('posts')).order_by('-posts_number')[:authors]
+    feeds += [
+        reverse('posts:profile', args=[author.username])
+        for author in top_authors
+    ]
+    return [
+        f'{feed}?page={page}'
+        for feed in feeds
+        for page in range(1, pages + 1)
+    ]
+
+
+def render_url(url):
+    """Рендерит страницу от имени гостя, заполняя кэши и миниатюры."""
+    # django.test.client тянет за собой много модулей, а нужен
+    # только командам и фоновым задачам, а не каждому процессу сайта.
+    from django.test.client import RequestFactory
+
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(request.path_info)
+    view, args, kwargs = request.resolver_match
+    with force_refresh():
+        try:
+            return view(request, *args, **kwargs).status_code
+        except Http404:
+            return 404
+
+
+def _render_in_worker(url):
+    try:
+        return render_url(url)
+    finally:
+        connection.close()
+
+
+def warm(urls, workers):
+    """Рендерит ``urls`` в пуле потоков и возвращает коды ответов."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        statuses = dict(zip(urls, executor.map(_render_in_worker, urls)))
+    mark_warmed()
+    return statuses
+
+
+def refresh_first_pages(post_id):
+    """Заново рендерит первые страницы лент, в которые попадает пост."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id).first()
+    if post is not None:
+        for url in first_page_urls(post):
+            render_url(url)
@@ -0,0 +1,28 @@
+from django import forms
+from django.urls import reverse_lazy
+from django.utils.html import format_html
+
+from .caches import group_cache
+
+
+class GroupAutocompleteWidget(forms.Widget):
+    """Поле поиска группы по названию вместо списка из всех групп."""
+
+    url = reverse_lazy('posts:group_autocomplete')
+
+    class Media:
+        js = ('js/group_autocomplete.js',)
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        field_id = attrs.get('id', f'id_{name}')
+        group = group_cache.get(int(value)) if str(value).isdigit() else None
+        return format_html(
+            '<input type="hidden" name="{name}" id="{id}" value="{value}">'
+            '<input type="search" id="{id}_search" list="{id}_options" '
+            'class="{css}" value="{title}" autocomplete="off" '
+            'data-autocomplete-url="{url}" data-target="{id}">'
+            '<datalist id="{id}_options"></datalist>',
+            name=name, id=field_id, value=value or '',
+            title=group.title if group else '',
+            css=attrs.get('class', 'form-control'), url=self.url)
@@ -0,0 +1,107 @@
+"""Комментарии и подписки в режиме отложенной записи."""
+from django.db.models import Q
+from django.utils import timezone
+
+from core.paginator import bump_count_version
+from core.write_behind import handler, pending
+
+from .models import Comment, Follow, Notification, Post, User
+from .new_posts import follows_changed
+from .notifications import notify
+
+
+def _existing(model, pks):
+    return set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+@handler('comment')
+def apply_comments(payloads):
+    post_authors = dict(Post.objects.filter(
+        pk__in={payload['post'] for payload in payloads}).values_list(
+            'pk', 'author_id'))
+    users = _existing(User, {payload['author'] for payload in payloads})
+    # Пачку могли уже записать, но не успеть убрать из очереди.
+    written = {
+        write_id.hex for write_id in Comment.objects.filter(
+            write_id__in=[
+                payload['id'] for payload in payloads if 'id' in payload
+            ]).values_list('write_id', flat=True)
+    }
+    payloads = [
+        payload for payload in payloads
+        if payload['post'] in post_authors and payload['author'] in users
+        and payload.get('id') not in written
+    ]
+    Comment.objects.bulk_create([
+        Comment(post_id=payload['post'], author_id=payload['author'],
+                text=payload['text'], write_id=payload.get('id'))
+        for payload in payloads
+    ], ignore_conflicts=True)
+    notify([
+        Notification(
+            recipient_id=post_authors[payload['post']],
+            actor_id=payload['author'],
+            kind=Notification.COMMENT,
+            post_id=payload['post'])
+        for payload in payloads
+    ])
+
+
+@handler('follow')
+def apply_follows(payloads):
+    users = _existing(User, {
+        pk for payload in payloads for pk in payload.values()})
+    pairs = {
+        (payload['user'], payload['author']) for payload in payloads
+        if payload['user'] in users and payload['author'] in users
+    }
+    existing = set(Follow.objects.filter(
+        user__in={user for user, _ in pairs}).values_list(
+            'user_id', 'author_id'))
+    new = pairs - existing
+    Follow.objects.bulk_create([
+        Follow(user_id=user, author_id=author) for user, author in new
+    ], ignore_conflicts=True)
+    notify([
+        Notification(
+            recipient_id=author, actor_id=user, kind=Notification.FOLLOW)
+        for user, author in new
+    ])
+    for user in {user for user, _ in new}:
+        follows_changed(user)
+    bump_count_version(Post)
+
+
+@handler('unfollow')
+def apply_unfollows(payloads):
+    pairs = Q()
+    for payload in payloads:
+        pairs |= Q(user_id=payload['user'], author_id=payload['author'])
+    Follow.objects.filter(pairs).delete()
+
+
+def pending_comments(user, post, comments):
+    """Ещё не записанные комментарии пользователя к посту.
+
+    Комментарий, который уже есть среди ``comments``, не повторяется.
+    """
+    saved = {(comment.author_id, comment.text) for comment in comments}
+    saved_ids = {
+        comment.write_id.hex for comment in comments if comment.write_id
+    }
+    return [
+        Comment(post=post, author=user, text=payload['text'],
+                created=timezone.now())
+        for _, _, payload in pending(user.pk, 'comment')
+        if payload['post'] == post.pk
+        and payload.get('id') not in saved_ids
+        and (user.pk, payload['text']) not in saved
+    ]
+
+
+def pending_following(user, author, following):
+    """Подписка на автора с учётом ещё не записанных действий."""
+    for _, action, payload in pending(user.pk):
+        if action in ('follow', 'unfollow') and payload['author'] == author.pk:
+            following = action == 'follow'
+    return following
@@ -0,0 +1,62 @@
+(function () {
+  const script = document.currentScript;
+  if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.register(script.dataset.serviceWorker);
+  }
+
+  // Скрипты, вставленные через innerHTML, не выполняются: создаём заново.
+  function runScripts(container) {
+    container.querySelectorAll('script').forEach(function (old) {
+      const fresh = document.createElement('script');
+      Array.from(old.attributes).forEach(function (attribute) {
+        fresh.setAttribute(attribute.name, attribute.value);
+      });
+      fresh.text = old.text;
+      old.replaceWith(fresh);
+    });
+  }
+
+  // В оболочке подгружаем содержимое страницы без шапки и подвала.
+  function loadFragment(main) {
+    const status = main.querySelector('[data-shell-status]');
+    fetch(location.pathname + location.search, {
+      credentials: 'same-origin',
+      headers: {'X-Fragment': '1'},
+    })
+      .then(function (response) {
+        if (response.redirected) {
+          // Например, вход для ленты подписок: полная страница из сети.
+          location.replace(response.url);
+          return;
+        }
+        if (response.headers.get('X-Fragment-User') !== main.dataset.user) {
+          // Шапка в кэше от другого пользователя: обновляем оболочку
+          // и забываем сохранённые им страницы постов.
+          if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage('user-changed');
+          }
+          return fetch(main.dataset.shellUrl, {cache: 'no-store'})
+            .then(function () {
+              location.reload();
+            });
+        }
+        return response.text().then(function (html) {
+          main.innerHTML = html;
+          runScripts(main);
+        });
+      })
+      .catch(function () {
+        if (status) {
+          status.textContent = 'Нет соединения с сервером. Открытые ' +
+            'недавно посты можно читать и без сети.';
+        }
+      });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    const main = document.querySelector('main[data-shell]');
+    if (main) {
+      loadFragment(main);
+    }
+  });
+})();
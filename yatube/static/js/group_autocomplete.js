@@ -0,0 +1,26 @@
+document.querySelectorAll('[data-autocomplete-url]').forEach(function (input) {
+  var target = document.getElementById(input.dataset.target);
+  var options = document.getElementById(input.list.id);
+  var groups = {};
+  var timer;
+
+  input.addEventListener('input', function () {
+    target.value = groups[input.value] || '';
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(input.value);
+      fetch(url).then(function (response) {
+        return response.json();
+      }).then(function (data) {
+        options.innerHTML = '';
+        data.results.forEach(function (group) {
+          groups[group.title] = group.id;
+          var option = document.createElement('option');
+          option.value = group.title;
+          options.appendChild(option);
+        });
+        target.value = groups[input.value] || '';
+      });
+    }, 200);
+  });
+});
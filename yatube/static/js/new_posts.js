@@ -0,0 +1,21 @@
+document.querySelectorAll('[data-new-posts-url]').forEach(function (badge) {
+  function poll() {
+    if (document.hidden) {
+      return;
+    }
+    // no-cache: браузер сам пришлёт If-None-Match и получит 304,
+    // пока новых постов нет.
+    fetch(badge.dataset.newPostsUrl, {credentials: 'same-origin', cache: 'no-cache'})
+      .then(function (response) {
+        return response.ok ? response.json() : null;
+      })
+      .then(function (data) {
+        if (data) {
+          badge.textContent = data.label;
+        }
+      });
+  }
+
+  poll();
+  setInterval(poll, 30000);
+});
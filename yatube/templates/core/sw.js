@@ -0,0 +1,151 @@
+// Service worker оболочки приложения. Настройки подставляет
+// core.views.service_worker.
+const CONFIG = {{ config|safe }};
+const SHELL_CACHE = 'shell-' + CONFIG.version;
+const POSTS_CACHE = 'posts';
+const SHELL_ROUTES = CONFIG.shellRoutes.map(function (route) {
+  return new RegExp(route);
+});
+const POST_ROUTE = new RegExp(CONFIG.postRoute);
+
+self.addEventListener('install', function (event) {
+  event.waitUntil(
+    caches.open(SHELL_CACHE)
+      .then(function (cache) {
+        return cache.addAll(CONFIG.assets);
+      })
+      .then(function () {
+        return self.skipWaiting();
+      })
+  );
+});
+
+self.addEventListener('activate', function (event) {
+  // Удаляем оболочки прошлых версий.
+  event.waitUntil(
+    caches.keys()
+      .then(function (names) {
+        return Promise.all(names.filter(function (name) {
+          return name.startsWith('shell-') && name !== SHELL_CACHE;
+        }).map(function (name) {
+          return caches.delete(name);
+        }));
+      })
+      .then(function () {
+        return self.clients.claim();
+      })
+  );
+});
+
+function trim(cache, limit) {
+  // Ключи идут в порядке добавления: первыми удаляются самые старые.
+  return cache.keys().then(function (keys) {
+    return Promise.all(keys.slice(0, Math.max(keys.length - limit, 0))
+      .map(function (key) {
+        return cache.delete(key);
+      }));
+  });
+}
+
+// Отдаёт копию из кэша сразу, а в фоне обновляет её из сети.
+function staleWhileRevalidate(event, cacheName, request) {
+  const key = new URL(request.url).pathname;
+  const cached = caches.open(cacheName).then(function (cache) {
+    return cache.match(key);
+  });
+  const fresh = fetch(request).then(function (response) {
+    if (response.ok && !response.redirected) {
+      const copy = response.clone();
+      event.waitUntil(caches.open(cacheName).then(function (cache) {
+        return cache.put(key, copy);
+      }));
+    }
+    return response;
+  });
+  event.waitUntil(fresh.catch(function () {}));
+  return cached.then(function (response) {
+    return response || fresh;
+  });
+}
+
+// Страница поста из сети, а без сети — последняя сохранённая копия.
+// Кэш только для чтения без сети: после комментария или лайка
+// пользователь должен сразу увидеть свежую страницу.
+function networkFirst(event, cacheName, limit) {
+  const key = new URL(event.request.url).pathname;
+  return fetch(event.request)
+    .then(function (response) {
+      if (response.ok && !response.redirected) {
+        const copy = response.clone();
+        event.waitUntil(caches.open(cacheName).then(function (cache) {
+          // Удаление и запись заново переносят ключ в конец очереди.
+          return cache.delete(key)
+            .then(function () {
+              return cache.put(key, copy);
+            })
+            .then(function () {
+              return trim(cache, limit);
+            });
+        }));
+      }
+      return response;
+    })
+    .catch(function (error) {
+      return caches.open(cacheName)
+        .then(function (cache) {
+          return cache.match(key);
+        })
+        .then(function (response) {
+          if (!response) {
+            throw error;
+          }
+          return response;
+        });
+    });
+}
+
+self.addEventListener('message', function (event) {
+  if (event.data === 'user-changed') {
+    // Сохранённые страницы постов показывают шапку, CSRF-токен
+    // и лайки прежнего пользователя.
+    event.waitUntil(caches.delete(POSTS_CACHE));
+  }
+});
+
+self.addEventListener('fetch', function (event) {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+  if (request.mode === 'navigate') {
+    if (POST_ROUTE.test(url.pathname)) {
+      event.respondWith(networkFirst(event, POSTS_CACHE, CONFIG.postLimit));
+    } else if (SHELL_ROUTES.some(function (route) {
+      return route.test(url.pathname);
+    })) {
+      // Содержимое ленты оболочка запросит сама, без шапки и подвала.
+      event.respondWith(staleWhileRevalidate(
+        event, SHELL_CACHE, new Request(CONFIG.shell)));
+    }
+    return;
+  }
+  if (url.pathname === CONFIG.shell) {
+    // Оболочку запрашивает app.js, когда в ней устарел пользователь.
+    event.respondWith(fetch(request).then(function (response) {
+      if (response.ok) {
+        const copy = response.clone();
+        event.waitUntil(caches.open(SHELL_CACHE).then(function (cache) {
+          return cache.put(CONFIG.shell, copy);
+        }));
+      }
+      return response;
+    }));
+    return;
+  }
+  if (CONFIG.assets.indexOf(url.pathname) !== -1) {
+    event.respondWith(caches.match(url.pathname).then(function (response) {
+      return response || fetch(request);
+    }));
+  }
+});
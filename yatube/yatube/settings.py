@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -29,6 +33,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.HealthCheckMiddleware',
+    'core.middleware.RequestLogMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.FragmentMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,6 +62,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.fragment.fragment',
+                'posts.context_processors.notifications',
             ],
         },
     },
@@ -100,6 +111,38 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic добавляет хэш к именам файлов и кладёт рядом .gz и .br.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Время кэширования статики без хэша в имени, в секундах.
+STATIC_MAX_AGE = 60
+
+# Ответы короче этого числа байт отдаются без сжатия.
+COMPRESS_MIN_SIZE = 500
+
+HTML_MINIFY = True
+
+# Допустимая частота запросов к пишущим view: 'число/s|m|h|d'.
+RATELIMITS = {
+    'post_create': '10/m',
+    'add_comment': '20/m',
+    'profile_follow': '30/m',
+    'like': '60/m',
+    'signup': '5/m',
+}
+
+# Во сколько раз лимит для IP больше лимита для одного пользователя.
+RATELIMIT_IP_MULTIPLIER = 5
+
+# Сколько обратных прокси стоит перед сайтом и дописывает адрес клиента
+# в X-Forwarded-For. При нуле адрес клиента — REMOTE_ADDR.
+TRUSTED_PROXY_COUNT = 0
+
+# Сессии читаются из общего кэша; в базу запрос идёт только при промахе.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -112,14 +155,167 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
 
+# Карты сайта: адресов в одной части, строк в одном запросе к БД
+# и сколько секунд части хранятся в кэше.
+SITEMAP_LIMIT = 50000
+
+SITEMAP_CHUNK = 2000
+
+SITEMAP_CACHE_SECONDS = 60 * 60
+
+# Просмотры постов копятся в памяти процесса и пишутся в БД пачкой
+# не чаще раза в столько секунд или когда накопится столько постов.
+VIEW_COUNT_FLUSH_INTERVAL = 60
+
+VIEW_COUNT_MAX_PENDING = 1000
+
+# Страницы, которые service worker открывает в закэшированной оболочке
+# приложения (регулярные выражения для пути, общие для Python и JS),
+# и сколько последних открытых постов он хранит для чтения без сети.
+PWA_SHELL_ROUTES = [
+    r'^/$',
+    r'^/follow/$',
+    r'^/group/[^/]+/$',
+    r'^/profile/[^/]+/$',
+    r'^/archive/',
+    r'^/group/[^/]+/archive/',
+    r'^/profile/[^/]+/archive/',
+]
+
+PWA_POST_ROUTE = r'^/posts/\d+/$'
+
+PWA_POST_CACHE_LIMIT = 50
+
+# Длина превью поста в лентах, символов.
+POST_PREVIEW_LENGTH = 300
+
+# Как часто, в секундах, авторам уходят сводки уведомлений
+# и сколько событий обрабатывается за один проход.
+NOTIFICATION_DIGEST_INTERVAL = 60 * 60
+
+NOTIFICATION_DIGEST_BATCH = 500
+
+# Сколько групп выводить списком в форме поста, дальше — поиск по названию.
+GROUP_AUTOCOMPLETE_THRESHOLD = 100
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Каталог для файлов, которые сайт пишет во время работы. Тесты
+# (manage.py test и pytest) получают свой временный каталог и не видят
+# кэш, очередь и журнал запущенного сайта.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+RUNTIME_DIR = BASE_DIR
+
+if TESTING:
+    RUNTIME_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, RUNTIME_DIR, ignore_errors=True)
+
+# Общий для всех WSGI-процессов кэш в отдельном файле SQLite
+# с небольшим LRU в памяти каждого процесса.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.path.join(RUNTIME_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'L1_MAX_ENTRIES': 500,
+            'L1_TIMEOUT': 5,
+            'GENERATION_CHECK_INTERVAL': 1,
+        },
     }
 }
 
+# Комментарии и подписки пишутся в локальную очередь и применяются
+# пачками командой apply_writes, чтобы не ждать блокировку SQLite.
+WRITE_BEHIND = False
+
+WRITE_BEHIND_PATH = os.path.join(RUNTIME_DIR, 'write_behind.sqlite3')
+
+# После стольких неудачных попыток действие откладывается в таблицу
+# failed очереди и больше не задерживает остальные.
+WRITE_BEHIND_MAX_ATTEMPTS = 5
+
+# Журнал в формате JSON Lines; пишется отдельным потоком пачками.
+LOG_FILE = os.path.join(RUNTIME_DIR, 'logs', 'yatube.jsonl')
+
+# Доля успешных быстрых запросов, которые попадают в журнал.
+LOG_REQUEST_SAMPLE_RATE = 0.1
+
+# Запросы дольше этого числа миллисекунд пишутся всегда.
+LOG_SLOW_REQUEST_MS = 500
+
+# Обработчики console и mail_admins — как в настройках Django по умолчанию.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'require_debug_false': {
+            '()': 'django.utils.log.RequireDebugFalse',
+        },
+        'require_debug_true': {
+            '()': 'django.utils.log.RequireDebugTrue',
+        },
+    },
+    'handlers': {
+        'console': {
+            'level': 'INFO',
+            'filters': ['require_debug_true'],
+            'class': 'logging.StreamHandler',
+        },
+        'mail_admins': {
+            'level': 'ERROR',
+            'filters': ['require_debug_false'],
+            'class': 'django.utils.log.AdminEmailHandler',
+        },
+        'json': {
+            'class': 'core.json_logging.AsyncJSONHandler',
+            'filename': LOG_FILE,
+        },
+    },
+    'loggers': {
+        'yatube.requests': {
+            'handlers': ['json'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'django': {
+            'handlers': ['console', 'mail_admins', 'json'],
+            'level': 'INFO',
+        },
+        # Ответы 4xx и 5xx уже пишет в JSON RequestLogMiddleware,
+        # вместе с трассировкой ошибки.
+        'django.request': {
+            'handlers': ['console', 'mail_admins'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core': {
+            'handlers': ['json'],
+            'level': 'INFO',
+        },
+        'posts': {
+            'handlers': ['json'],
+            'level': 'INFO',
+        },
+    },
+}
+
+HEALTH_LIVENESS_PATH = '/healthz'
+
+HEALTH_READINESS_PATH = '/readyz'
+
+# Сколько секунд процесс отдаёт прошлый результат проверки готовности.
+READINESS_CACHE_SECONDS = 5
+
+# Модули, которые приложение импортирует по требованию; при
+# YATUBE_PRELOAD=1 они загружаются до fork рабочих процессов.
+PRELOAD_MODULES = [
+    'PIL.Image',
+    'sorl.thumbnail.shortcuts',
+    'sorl.thumbnail.engines.pil_engine',
+]
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -3,12 +3,17 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core import views as core_views
+
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('admin/', admin.site.urls),
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('shell/', core_views.app_shell, name='app_shell'),
+    path('sw.js', core_views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', core_views.manifest, name='manifest'),
 ]
 if settings.DEBUG:
     urlpatterns += static(